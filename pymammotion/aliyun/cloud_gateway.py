@@ -9,6 +9,7 @@ from logging import getLogger
 import random
 import string
 import time
+from typing import Any
 import uuid
 
 from aiohttp import ClientSession
@@ -17,30 +18,21 @@ from alibabacloud_iot_api_gateway.models import CommonParams, Config, IoTApiRequ
 from alibabacloud_tea_util.client import Client as UtilClient
 from alibabacloud_tea_util.models import RuntimeOptions
 
+from pymammotion.aliyun.api_gateway_client import MOVE_HEADERS, ApiGatewayClient
 from pymammotion.aliyun.model.aep_response import AepResponse
+from pymammotion.aliyun.model.cached_session import CachedSession
 from pymammotion.aliyun.model.connect_response import ConnectResponse
 from pymammotion.aliyun.model.dev_by_account_response import ListingDevByAccountResponse
 from pymammotion.aliyun.model.login_by_oauth_response import LoginByOAuthResponse
 from pymammotion.aliyun.model.regions_response import RegionResponse
 from pymammotion.aliyun.model.session_by_authcode_response import SessionByAuthCodeResponse
+from pymammotion.aliyun.token_manager import IotTokenManager
 from pymammotion.const import ALIYUN_DOMAIN, APP_KEY, APP_SECRET, APP_VERSION
 from pymammotion.http.http import MammotionHTTP
 from pymammotion.utility.datatype_converter import DatatypeConverter
 
 logger = getLogger(__name__)
 
-MOVE_HEADERS = (
-    "x-ca-signature",
-    "x-ca-signature-headers",
-    "accept",
-    "content-md5",
-    "content-type",
-    "date",
-    "host",
-    "token",
-    "user-agent",
-)
-
 
 class SetupException(Exception):
     """Raise when mqtt expires token or token is invalid."""
@@ -99,6 +91,49 @@ class CloudIOTGateway:
         self._session_by_authcode_response = session_by_authcode_response
         self._region_response = region_response
         self._devices_by_account_response = dev_by_account
+        self._api_client = ApiGatewayClient(self._app_key, self._app_secret)
+        self._iot_token_issued_at = 0
+        self._token_manager = IotTokenManager(self)
+
+    @classmethod
+    def from_cached_session(cls, cached: CachedSession) -> "CloudIOTGateway":
+        """Rebuild a logged in gateway from a cached session."""
+        gateway = cls(
+            connect_response=cached.connect_response,
+            login_by_oauth_response=cached.login_by_oauth_response,
+            aep_response=cached.aep_response,
+            session_by_authcode_response=cached.session_by_authcode_response,
+            region_response=cached.region_response,
+            dev_by_account=cached.dev_by_account,
+        )
+        # the mqtt credentials from aep_handle are bound to these ids
+        gateway._client_id = cached.client_id
+        gateway._device_sn = cached.device_sn
+        gateway._utdid = cached.utdid
+        gateway._iot_token_issued_at = cached.iot_token_issued_at
+        mammotion_http = MammotionHTTP()
+        mammotion_http.set_login_info(cached.login_info)
+        gateway.set_http(mammotion_http)
+        # the restored token never went through the login chain, so nothing has scheduled its refresh yet
+        gateway._token_manager.on_token_issued()
+        return gateway
+
+    def to_cached_session(self) -> CachedSession:
+        """Return the responses of the completed login chain for caching."""
+        return CachedSession(
+            saved_at=int(time.time()),
+            iot_token_issued_at=self._iot_token_issued_at,
+            client_id=self._client_id,
+            device_sn=self._device_sn,
+            utdid=self._utdid,
+            login_info=self.mammotion_http.login_info,
+            region_response=self._region_response,
+            connect_response=self._connect_response,
+            login_by_oauth_response=self._login_by_oauth_response,
+            aep_response=self._aep_response,
+            session_by_authcode_response=self._session_by_authcode_response,
+            dev_by_account=self._devices_by_account_response,
+        )
 
     @staticmethod
     def generate_random_string(length: int):
@@ -127,18 +162,32 @@ class CloudIOTGateway:
             hashlib.sha1,
         ).hexdigest()
 
-    def get_region(self, country_code: str, auth_code: str):
-        """Get the region based on country code and auth code."""
+    def _client(self, domain: str) -> Client:
+        """Build a synchronous gateway client for ``domain``."""
         config = Config(
             app_key=self._app_key,
             app_secret=self._app_secret,
-            domain=self.domain,
+            domain=domain,
         )
-        client = Client(config)
+        return Client(config)
 
+    def _do_request(self, domain: str, pathname: str, body: IoTApiRequest) -> bytes:
+        """Send a request with the synchronous alibabacloud client and return the raw body."""
+        response = self._client(domain).do_request(pathname, "https", "POST", None, body, RuntimeOptions())
+        logger.debug(response.status_message)
+        logger.debug(response.headers)
+        logger.debug(response.status_code)
+        logger.debug(response.body)
+        return response.body
+
+    @property
+    def _api_gateway_endpoint(self) -> str:
+        return self._region_response.data.apiGatewayEndpoint
+
+    def _region_request(self, country_code: str, auth_code: str) -> IoTApiRequest:
         # build request
         request = CommonParams(api_ver="1.0.2", language="en-US")
-        body = IoTApiRequest(
+        return IoTApiRequest(
             id=str(uuid.uuid4()),
             params={
                 "authCode": auth_code,
@@ -149,18 +198,9 @@ class CloudIOTGateway:
             version="1.0",
         )
 
-        # send request
-        response = client.do_request("/living/account/region/get", "https", "POST", None, body, RuntimeOptions())
-        logger.debug(response.status_message)
-        logger.debug(response.headers)
-        logger.debug(response.status_code)
-        logger.debug(response.body)
-
-        # Decode the response body
-        response_body_str = response.body.decode("utf-8")
-
+    def _handle_region_response(self, response_body: bytes) -> bytes:
         # Load the JSON string into a dictionary
-        response_body_dict = json.loads(response_body_str)
+        response_body_dict = json.loads(response_body.decode("utf-8"))
 
         if int(response_body_dict.get("code")) != 200:
             raise Exception("Error in getting regions: " + response_body_dict["msg"])
@@ -168,22 +208,29 @@ class CloudIOTGateway:
         self._region_response = RegionResponse.from_dict(response_body_dict)
         logger.debug("Endpoint: %s", self._region_response.data.mqttEndpoint)
 
-        return response.body
+        return response_body
 
-    def aep_handle(self):
-        """Handle AEP authentication."""
+    def get_region(self, country_code: str, auth_code: str):
+        """Get the region based on country code and auth code."""
+        body = self._region_request(country_code, auth_code)
+        # send request
+        response_body = self._do_request(self.domain, "/living/account/region/get", body)
+        return self._handle_region_response(response_body)
+
+    async def async_get_region(self, country_code: str, auth_code: str) -> bytes:
+        """Get the region based on country code and auth code."""
+        body = self._region_request(country_code, auth_code)
+        response_body = await self._api_client.do_request(self.domain, "/living/account/region/get", body)
+        return self._handle_region_response(response_body)
+
+    def _aep_domain(self) -> str:
         aep_domain = self.domain
 
         if self._region_response.data.apiGatewayEndpoint is not None:
             aep_domain = self._region_response.data.apiGatewayEndpoint
+        return aep_domain
 
-        config = Config(
-            app_key=self._app_key,
-            app_secret=self._app_secret,
-            domain=aep_domain,
-        )
-        client = Client(config)
-
+    def _aep_request(self) -> IoTApiRequest:
         request = CommonParams(api_ver="1.0.0", language="en-US")
         logger.debug("client id %s", self._client_id)
         time_now = time.time()
@@ -194,7 +241,7 @@ class CloudIOTGateway:
             "timestamp": str(time_now),
         }
 
-        body = IoTApiRequest(
+        return IoTApiRequest(
             id=str(uuid.uuid4()),
             params={
                 "authInfo": {
@@ -208,16 +255,8 @@ class CloudIOTGateway:
             version="1.0",
         )
 
-        # send request
-        response = client.do_request("/app/aepauth/handle", "https", "POST", None, body, RuntimeOptions())
-        logger.debug(response.status_message)
-        logger.debug(response.headers)
-        logger.debug(response.status_code)
-        logger.debug(response.body)
-
-        response_body_str = response.body.decode("utf-8")
-
-        response_body_dict = json.loads(response_body_str)
+    def _handle_aep_response(self, response_body: bytes) -> bytes:
+        response_body_dict = json.loads(response_body.decode("utf-8"))
 
         if int(response_body_dict.get("code")) != 200:
             raise Exception("Error in getting mqtt credentials: " + response_body_dict["msg"])
@@ -226,7 +265,20 @@ class CloudIOTGateway:
 
         logger.debug(response_body_dict)
 
-        return response.body
+        return response_body
+
+    def aep_handle(self):
+        """Handle AEP authentication."""
+        # send request
+        response_body = self._do_request(self._aep_domain(), "/app/aepauth/handle", self._aep_request())
+        return self._handle_aep_response(response_body)
+
+    async def async_aep_handle(self) -> bytes:
+        """Handle AEP authentication."""
+        response_body = await self._api_client.do_request(
+            self._aep_domain(), "/app/aepauth/handle", self._aep_request()
+        )
+        return self._handle_aep_response(response_body)
 
     async def connect(self):
         """Connect to the Aliyun Cloud IoT Gateway."""
@@ -374,18 +426,10 @@ class CloudIOTGateway:
                     return self._login_by_oauth_response
                 raise LoginException(data)
 
-    def session_by_auth_code(self):
-        """Create a session by auth code."""
-        config = Config(
-            app_key=self._app_key,
-            app_secret=self._app_secret,
-            domain=self._region_response.data.apiGatewayEndpoint,
-        )
-        client = Client(config)
-
+    def _session_by_auth_code_request(self) -> IoTApiRequest:
         # build request
         request = CommonParams(api_ver="1.0.4", language="en-US")
-        body = IoTApiRequest(
+        return IoTApiRequest(
             id=str(uuid.uuid4()),
             params={
                 "request": {
@@ -398,22 +442,9 @@ class CloudIOTGateway:
             version="1.0",
         )
 
-        # send request
-        response = client.do_request(
-            "/account/createSessionByAuthCode",
-            "https",
-            "POST",
-            None,
-            body,
-            RuntimeOptions(),
-        )
-        logger.debug(response.status_message)
-        logger.debug(response.headers)
-        logger.debug(response.status_code)
-        logger.debug(response.body)
-
+    def _handle_session_by_auth_code_response(self, response_body: bytes) -> bytes:
         # Decode the response body
-        response_body_str = response.body.decode("utf-8")
+        response_body_str = response_body.decode("utf-8")
 
         # Load the JSON string into a dictionary
         response_body_dict = json.loads(response_body_str)
@@ -428,67 +459,29 @@ class CloudIOTGateway:
 
         self._session_by_authcode_response = session_by_auth
         self._iot_token_issued_at = int(time.time())
+        self._token_manager.on_token_issued()
 
-        return response.body
-
-    def sign_out(self) -> None:
-        config = Config(
-            app_key=self._app_key,
-            app_secret=self._app_secret,
-            domain=self._region_response.data.apiGatewayEndpoint,
-        )
-        client = Client(config)
-
-        # build request
-        request = CommonParams(api_ver="1.0.4", language="en-US")
-        body = IoTApiRequest(
-            id=str(uuid.uuid4()),
-            params={
-                "request": {
-                    "refreshToken": self._session_by_authcode_response.data.refreshToken,
-                    "identityId": self._session_by_authcode_response.data.identityId,
-                }
-            },
-            request=request,
-            version="1.0",
-        )
+        return response_body
 
+    def session_by_auth_code(self):
+        """Create a session by auth code."""
         # send request
-        # possibly need to do this ourselves
-        response = client.do_request(
-            "/iotx/account/invalidSession",
-            "https",
-            "POST",
-            None,
-            body,
-            RuntimeOptions(),
+        response_body = self._do_request(
+            self._api_gateway_endpoint, "/account/createSessionByAuthCode", self._session_by_auth_code_request()
         )
-        logger.debug(response.status_message)
-        logger.debug(response.headers)
-        logger.debug(response.status_code)
-        logger.debug(response.body)
-
-        # Decode the response body
-        response_body_str = response.body.decode("utf-8")
-
-        # Load the JSON string into a dictionary
-        response_body_dict = json.loads(response_body_str)
-        logger.debug(response_body_dict)
-        return response_body_dict
+        return self._handle_session_by_auth_code_response(response_body)
 
-    def check_or_refresh_session(self):
-        """Check or refresh the session."""
-        logger.debug("Trying to refresh token")
-        config = Config(
-            app_key=self._app_key,
-            app_secret=self._app_secret,
-            domain=self._region_response.data.apiGatewayEndpoint,
+    async def async_session_by_auth_code(self) -> bytes:
+        """Create a session by auth code."""
+        response_body = await self._api_client.do_request(
+            self._api_gateway_endpoint, "/account/createSessionByAuthCode", self._session_by_auth_code_request()
         )
-        client = Client(config)
+        return self._handle_session_by_auth_code_response(response_body)
 
+    def _refresh_token_request(self) -> IoTApiRequest:
         # build request
         request = CommonParams(api_ver="1.0.4", language="en-US")
-        body = IoTApiRequest(
+        return IoTApiRequest(
             id=str(uuid.uuid4()),
             params={
                 "request": {
@@ -500,32 +493,27 @@ class CloudIOTGateway:
             version="1.0",
         )
 
+    def sign_out(self) -> None:
         # send request
         # possibly need to do this ourselves
-        response = client.do_request(
-            "/account/checkOrRefreshSession",
-            "https",
-            "POST",
-            None,
-            body,
-            RuntimeOptions(),
+        response_body = self._do_request(
+            self._api_gateway_endpoint, "/iotx/account/invalidSession", self._refresh_token_request()
         )
-        logger.debug(response.status_message)
-        logger.debug(response.headers)
-        logger.debug(response.status_code)
-        logger.debug(response.body)
-
-        # Decode the response body
-        response_body_str = response.body.decode("utf-8")
 
         # Load the JSON string into a dictionary
-        response_body_dict = json.loads(response_body_str)
+        response_body_dict = json.loads(response_body.decode("utf-8"))
+        logger.debug(response_body_dict)
+        return response_body_dict
 
-        if int(response_body_dict.get("code")) != 200:
-            logger.error(response_body_dict)
-            self.sign_out()
-            raise CheckSessionException("Error check or refresh token: " + response_body_dict.__str__())
+    async def async_sign_out(self) -> dict:
+        response_body = await self._api_client.do_request(
+            self._api_gateway_endpoint, "/iotx/account/invalidSession", self._refresh_token_request()
+        )
+        response_body_dict = json.loads(response_body.decode("utf-8"))
+        logger.debug(response_body_dict)
+        return response_body_dict
 
+    def _handle_refresh_session_response(self, response_body_dict: dict) -> None:
         session = SessionByAuthCodeResponse.from_dict(response_body_dict)
         session_data = session.data
 
@@ -540,83 +528,59 @@ class CloudIOTGateway:
 
         self._session_by_authcode_response = session
         self._iot_token_issued_at = int(time.time())
+        self._token_manager.on_token_issued()
 
-    def list_binding_by_account(self) -> ListingDevByAccountResponse:
-        """List bindings by account."""
-        config = Config(
-            app_key=self._app_key,
-            app_secret=self._app_secret,
-            domain=self._region_response.data.apiGatewayEndpoint,
-        )
-
-        client = Client(config)
-
-        # build request
-        request = CommonParams(
-            api_ver="1.0.8",
-            language="en-US",
-            iot_token=self._session_by_authcode_response.data.iotToken,
-        )
-        body = IoTApiRequest(
-            id=str(uuid.uuid4()),
-            params={"pageSize": 100, "pageNo": 1},
-            request=request,
-            version="1.0",
-        )
-
+    def check_or_refresh_session(self):
+        """Check or refresh the session."""
+        logger.debug("Trying to refresh token")
         # send request
-        response = client.do_request("/uc/listBindingByAccount", "https", "POST", None, body, RuntimeOptions())
-        logger.debug(response.status_message)
-        logger.debug(response.headers)
-        logger.debug(response.status_code)
-        logger.debug(response.body)
-
-        # Decode the response body
-        response_body_str = response.body.decode("utf-8")
+        # possibly need to do this ourselves
+        response_body = self._do_request(
+            self._api_gateway_endpoint, "/account/checkOrRefreshSession", self._refresh_token_request()
+        )
 
         # Load the JSON string into a dictionary
-        response_body_dict = json.loads(response_body_str)
+        response_body_dict = json.loads(response_body.decode("utf-8"))
 
         if int(response_body_dict.get("code")) != 200:
-            raise Exception("Error in creating session: " + response_body_dict["msg"])
+            logger.error(response_body_dict)
+            self.sign_out()
+            raise CheckSessionException("Error check or refresh token: " + response_body_dict.__str__())
 
-        self._devices_by_account_response = ListingDevByAccountResponse.from_dict(response_body_dict)
-        return self._devices_by_account_response
+        self._handle_refresh_session_response(response_body_dict)
 
-    def list_binding_by_dev(self, iot_id: str):
-        config = Config(
-            app_key=self._app_key,
-            app_secret=self._app_secret,
-            domain=self._region_response.data.apiGatewayEndpoint,
+    async def async_check_or_refresh_session(self) -> None:
+        """Check or refresh the session."""
+        logger.debug("Trying to refresh token")
+        response_body = await self._api_client.do_request(
+            self._api_gateway_endpoint, "/account/checkOrRefreshSession", self._refresh_token_request()
         )
+        response_body_dict = json.loads(response_body.decode("utf-8"))
+
+        if int(response_body_dict.get("code")) != 200:
+            logger.error(response_body_dict)
+            await self.async_sign_out()
+            raise CheckSessionException("Error check or refresh token: " + response_body_dict.__str__())
 
-        client = Client(config)
+        self._handle_refresh_session_response(response_body_dict)
 
+    def _list_binding_request(self, **params: Any) -> IoTApiRequest:
         # build request
         request = CommonParams(
             api_ver="1.0.8",
             language="en-US",
             iot_token=self._session_by_authcode_response.data.iotToken,
         )
-        body = IoTApiRequest(
+        return IoTApiRequest(
             id=str(uuid.uuid4()),
-            params={"pageSize": 100, "pageNo": 1, "iotId": iot_id},
+            params={"pageSize": 100, "pageNo": 1, **params},
             request=request,
             version="1.0",
         )
 
-        # send request
-        response = client.do_request("/uc/listBindingByDev", "https", "POST", None, body, RuntimeOptions())
-        logger.debug(response.status_message)
-        logger.debug(response.headers)
-        logger.debug(response.status_code)
-        logger.debug(response.body)
-
-        # Decode the response body
-        response_body_str = response.body.decode("utf-8")
-
+    def _handle_list_binding_response(self, response_body: bytes) -> ListingDevByAccountResponse:
         # Load the JSON string into a dictionary
-        response_body_dict = json.loads(response_body_str)
+        response_body_dict = json.loads(response_body.decode("utf-8"))
 
         if int(response_body_dict.get("code")) != 200:
             raise Exception("Error in creating session: " + response_body_dict["msg"])
@@ -624,13 +588,36 @@ class CloudIOTGateway:
         self._devices_by_account_response = ListingDevByAccountResponse.from_dict(response_body_dict)
         return self._devices_by_account_response
 
-    def send_cloud_command(self, iot_id: str, command: bytes) -> str:
-        """Send a cloud command to the specified IoT device."""
+    def list_binding_by_account(self) -> ListingDevByAccountResponse:
+        """List bindings by account."""
+        # send request
+        response_body = self._do_request(
+            self._api_gateway_endpoint, "/uc/listBindingByAccount", self._list_binding_request()
+        )
+        return self._handle_list_binding_response(response_body)
 
-        if command is None:
-            raise Exception("Command is missing / None")
+    async def async_list_binding_by_account(self) -> ListingDevByAccountResponse:
+        """List bindings by account."""
+        response_body = await self._api_client.do_request(
+            self._api_gateway_endpoint, "/uc/listBindingByAccount", self._list_binding_request()
+        )
+        return self._handle_list_binding_response(response_body)
+
+    def list_binding_by_dev(self, iot_id: str):
+        # send request
+        response_body = self._do_request(
+            self._api_gateway_endpoint, "/uc/listBindingByDev", self._list_binding_request(iotId=iot_id)
+        )
+        return self._handle_list_binding_response(response_body)
+
+    async def async_list_binding_by_dev(self, iot_id: str) -> ListingDevByAccountResponse:
+        response_body = await self._api_client.do_request(
+            self._api_gateway_endpoint, "/uc/listBindingByDev", self._list_binding_request(iotId=iot_id)
+        )
+        return self._handle_list_binding_response(response_body)
 
-        """Check if iotToken is expired"""
+    def _iot_token_needs_refresh(self) -> bool:
+        """Check if iotToken is expired, raises AuthRefreshException if it can no longer be refreshed."""
         if self._iot_token_issued_at + self._session_by_authcode_response.data.iotTokenExpire <= (
             int(time.time()) + (5 * 3600)
         ):
@@ -638,17 +625,13 @@ class CloudIOTGateway:
             if self._iot_token_issued_at + self._session_by_authcode_response.data.refreshTokenExpire > (
                 int(time.time())
             ):
-                self.check_or_refresh_session()
-            else:
-                raise AuthRefreshException("Refresh token expired. Please re-login")
-
-        config = Config(
-            app_key=self._app_key,
-            app_secret=self._app_secret,
-            domain=self._region_response.data.apiGatewayEndpoint,
-        )
+                return True
+            raise AuthRefreshException("Refresh token expired. Please re-login")
+        return False
 
-        client = Client(config)
+    def _cloud_command_request(self, iot_id: str, command: bytes) -> IoTApiRequest:
+        if command is None:
+            raise Exception("Command is missing / None")
 
         # build request
         request = CommonParams(
@@ -659,29 +642,23 @@ class CloudIOTGateway:
 
         # TODO move to using InvokeThingServiceRequest()
 
-        message_id = str(uuid.uuid4())
-
-        body = IoTApiRequest(
-            id=message_id,
+        content = self.converter.printBase64Binary(command)
+        logger.debug(content)
+        return IoTApiRequest(
+            id=str(uuid.uuid4()),
             params={
-                "args": {"content": self.converter.printBase64Binary(command)},
+                "args": {"content": content},
                 "identifier": "device_protobuf_sync_service",
                 "iotId": f"{iot_id}",
             },
             request=request,
             version="1.0",
         )
-        logger.debug(self.converter.printBase64Binary(command))
-        # send request
-        response = client.do_request("/thing/service/invoke", "https", "POST", None, body, RuntimeOptions())
-        logger.debug(response.status_message)
-        logger.debug(response.headers)
-        logger.debug(response.status_code)
-        logger.debug(response.body)
+
+    def _handle_cloud_command_response(self, iot_id: str, response_body: bytes) -> None:
         logger.debug(iot_id)
 
-        response_body_str = response.body.decode("utf-8")
-        response_body_dict = json.loads(response_body_str)
+        response_body_dict = json.loads(response_body.decode("utf-8"))
 
         if int(response_body_dict.get("code")) != 200:
             logger.error(
@@ -695,12 +672,52 @@ class CloudIOTGateway:
 
             if response_body_dict.get("code") == 29003:
                 logger.debug(self._session_by_authcode_response.data.identityId)
-                self.sign_out()
                 raise SetupException(response_body_dict.get("code"))
             if response_body_dict.get("code") == 6205:
                 raise DeviceOfflineException(response_body_dict.get("code"))
 
-        return message_id
+    def send_cloud_command(self, iot_id: str, command: bytes) -> str:
+        """Send a cloud command to the specified IoT device."""
+        if self._iot_token_needs_refresh():
+            self.check_or_refresh_session()
+
+        body = self._cloud_command_request(iot_id, command)
+        # send request
+        response_body = self._do_request(self._api_gateway_endpoint, "/thing/service/invoke", body)
+        try:
+            self._handle_cloud_command_response(iot_id, response_body)
+        except SetupException:
+            self.sign_out()
+            raise
+
+        return body.id
+
+    async def async_send_cloud_command(self, iot_id: str, command: bytes) -> str:
+        """Send a cloud command to the specified IoT device."""
+        await self._token_manager.ensure_valid()
+
+        body = self._cloud_command_request(iot_id, command)
+        response_body = await self._api_client.do_request(self._api_gateway_endpoint, "/thing/service/invoke", body)
+        try:
+            self._handle_cloud_command_response(iot_id, response_body)
+        except SetupException:
+            await self.async_sign_out()
+            raise
+
+        return body.id
+
+    async def close(self) -> None:
+        """Stop refreshing the token and close the pooled HTTP connections."""
+        self._token_manager.stop()
+        await self._api_client.close()
+
+    @property
+    def iot_token_issued_at(self) -> int:
+        return self._iot_token_issued_at
+
+    @property
+    def token_manager(self) -> IotTokenManager:
+        return self._token_manager
 
     @property
     def devices_by_account_response(self):
@@ -0,0 +1,36 @@
+from dataclasses import dataclass
+
+from mashumaro.config import BaseConfig
+from mashumaro.mixins.orjson import DataClassORJSONMixin
+
+from pymammotion.aliyun.model.aep_response import AepResponse
+from pymammotion.aliyun.model.connect_response import ConnectResponse
+from pymammotion.aliyun.model.dev_by_account_response import ListingDevByAccountResponse
+from pymammotion.aliyun.model.login_by_oauth_response import LoginByOAuthResponse
+from pymammotion.aliyun.model.regions_response import RegionResponse
+from pymammotion.aliyun.model.session_by_authcode_response import SessionByAuthCodeResponse
+from pymammotion.http.model.http import LoginResponseData
+
+CACHED_SESSION_VERSION = 1
+
+
+@dataclass
+class CachedSession(DataClassORJSONMixin):
+    """Everything a cold login produces, so it can be restored without repeating it."""
+
+    saved_at: int
+    iot_token_issued_at: int
+    client_id: str
+    device_sn: str
+    utdid: str
+    login_info: LoginResponseData
+    region_response: RegionResponse
+    connect_response: ConnectResponse
+    login_by_oauth_response: LoginByOAuthResponse
+    aep_response: AepResponse
+    session_by_authcode_response: SessionByAuthCodeResponse
+    dev_by_account: ListingDevByAccountResponse | None = None
+    version: int = CACHED_SESSION_VERSION
+
+    class Config(BaseConfig):
+        omit_none = True
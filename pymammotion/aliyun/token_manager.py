@@ -0,0 +1,142 @@
+"""Background refresh of the Aliyun iot token."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from logging import getLogger
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pymammotion.aliyun.cloud_gateway import CloudIOTGateway
+
+logger = getLogger(__name__)
+
+# refresh this long before the iot token expires, same window send_cloud_command always used
+REFRESH_AHEAD = 5 * 3600
+# wait this long before retrying a failed background refresh
+RETRY_DELAY = 60
+
+
+class IotTokenManager:
+    """Keep the iot token of a CloudIOTGateway fresh without blocking commands.
+
+    A refresh is scheduled with ``loop.call_later`` ahead of expiry every time a
+    token is issued. Concurrent callers share one refresh task, so a burst of
+    commands never triggers more than one checkOrRefreshSession round trip, and
+    commands only wait for it when the token has actually expired.
+    """
+
+    def __init__(
+        self,
+        gateway: CloudIOTGateway,
+        refresh_ahead: int = REFRESH_AHEAD,
+        retry_delay: int = RETRY_DELAY,
+    ) -> None:
+        self._gateway = gateway
+        self._refresh_ahead = refresh_ahead
+        self._retry_delay = retry_delay
+        self._refresh_handle: asyncio.TimerHandle | None = None
+        self._refresh_task: asyncio.Task | None = None
+        # called after every successful refresh, e.g. to persist the new token
+        self.on_refreshed: Callable[[], Awaitable[None]] | None = None
+
+    @property
+    def expires_at(self) -> int:
+        """Return the unix time the iot token expires."""
+        session = self._gateway.session_by_authcode_response
+        return self._gateway.iot_token_issued_at + session.data.iotTokenExpire
+
+    @property
+    def refresh_expires_at(self) -> int:
+        """Return the unix time the refresh token expires."""
+        session = self._gateway.session_by_authcode_response
+        return self._gateway.iot_token_issued_at + session.data.refreshTokenExpire
+
+    @property
+    def refresh_at(self) -> int:
+        """Return the unix time a background refresh should start."""
+        issued_at = self._gateway.iot_token_issued_at
+        # never closer than half the token lifetime, so short lived tokens don't refresh in a loop
+        return max(self.expires_at - self._refresh_ahead, issued_at + (self.expires_at - issued_at) // 2)
+
+    def is_expired(self) -> bool:
+        """Return True if the iot token can no longer be used."""
+        return self.expires_at <= int(time.time())
+
+    def needs_refresh(self) -> bool:
+        """Return True if the iot token is inside the refresh window."""
+        return self.refresh_at <= int(time.time())
+
+    def on_token_issued(self) -> None:
+        """Schedule the next refresh, called whenever the gateway stores a new token."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # issued from the synchronous client outside the event loop, picked up on next use
+            return
+        self.schedule(self.refresh_at - int(time.time()))
+
+    def schedule(self, delay: float) -> None:
+        """Start a background refresh after ``delay`` seconds."""
+        self.cancel_scheduled()
+        loop = asyncio.get_running_loop()
+        self._refresh_handle = loop.call_later(max(delay, 0), self._refresh_in_background)
+
+    def cancel_scheduled(self) -> None:
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+            self._refresh_handle = None
+
+    def _refresh_in_background(self) -> None:
+        self._refresh_handle = None
+        self.refresh()
+
+    def refresh(self) -> asyncio.Task:
+        """Return the in-flight refresh task, starting one if none is running."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh())
+            self._refresh_task.add_done_callback(self._on_refresh_done)
+        return self._refresh_task
+
+    async def _refresh(self) -> None:
+        # deferred to avoid a circular import, cloud_gateway owns this manager
+        from pymammotion.aliyun.cloud_gateway import AuthRefreshException, CheckSessionException
+
+        if self.refresh_expires_at <= int(time.time()):
+            raise AuthRefreshException("Refresh token expired. Please re-login")
+        try:
+            await self._gateway.async_check_or_refresh_session()
+        except (AuthRefreshException, CheckSessionException):
+            raise
+        except Exception:
+            if self.refresh_expires_at > int(time.time()):
+                self.schedule(self._retry_delay)
+            raise
+        if self.on_refreshed is not None:
+            # the token was refreshed, a failing hook must not be reported as a failed refresh
+            try:
+                await self.on_refreshed()
+            except Exception:
+                logger.exception("on_refreshed hook failed after refreshing the iot token")
+
+    def _on_refresh_done(self, task: asyncio.Task) -> None:
+        if task.cancelled():
+            return
+        if (ex := task.exception()) is not None:
+            logger.error("Failed to refresh iot token: %s", ex)
+
+    async def ensure_valid(self) -> None:
+        """Make sure the iot token can be used, only waiting if it has already expired."""
+        if self.is_expired():
+            await asyncio.shield(self.refresh())
+        elif self.needs_refresh():
+            self.refresh()
+
+    def stop(self) -> None:
+        """Cancel any scheduled or running refresh."""
+        self.cancel_scheduled()
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        self._refresh_task = None
@@ -1,10 +1,8 @@
-from asyncio import sleep
-from io import BytesIO
+from asyncio import Lock, sleep
 import itertools
 import json
 import logging
 import queue
-import sys
 import time
 
 from bleak import BleakClient
@@ -12,273 +10,21 @@ from jsonic.serializable import serialize
 
 from pymammotion.aliyun.tmp_constant import tmp_constant
 from pymammotion.bluetooth.const import UUID_WRITE_CHARACTERISTIC
+from pymammotion.bluetooth.crc import CRC_TB, Crc16, calc_crc  # noqa: F401  CRC_TB is re-exported
 from pymammotion.bluetooth.data.framectrldata import FrameCtrlData
 from pymammotion.bluetooth.data.notifydata import BlufiNotifyData
 from pymammotion.bluetooth.model.atomic_integer import AtomicInteger
+from pymammotion.bluetooth.model.write_stats import BleWriteStats
 from pymammotion.data.model.execute_boarder import ExecuteBorder
 from pymammotion.proto import DevNet, DrvDevInfoReq, LubaMsg, MsgAttr, MsgCmdType, MsgDevice
 from pymammotion.utility.constant.device_constant import bleOrderCmd
 
 _LOGGER = logging.getLogger(__name__)
 
-CRC_TB = [
-    0x0000,
-    0x1021,
-    0x2042,
-    0x3063,
-    0x4084,
-    0x50A5,
-    0x60C6,
-    0x70E7,
-    0x8108,
-    0x9129,
-    0xA14A,
-    0xB16B,
-    0xC18C,
-    0xD1AD,
-    0xE1CE,
-    0xF1EF,
-    0x1231,
-    0x0210,
-    0x3273,
-    0x2252,
-    0x52B5,
-    0x4294,
-    0x72F7,
-    0x62D6,
-    0x9339,
-    0x8318,
-    0xB37B,
-    0xA35A,
-    0xD3BD,
-    0xC39C,
-    0xF3FF,
-    0xE3DE,
-    0x2462,
-    0x3443,
-    0x0420,
-    0x1401,
-    0x64E6,
-    0x74C7,
-    0x44A4,
-    0x5485,
-    0xA56A,
-    0xB54B,
-    0x8528,
-    0x9509,
-    0xE5EE,
-    0xF5CF,
-    0xC5AC,
-    0xD58D,
-    0x3653,
-    0x2672,
-    0x1611,
-    0x0630,
-    0x76D7,
-    0x66F6,
-    0x5695,
-    0x46B4,
-    0xB75B,
-    0xA77A,
-    0x9719,
-    0x8738,
-    0xF7DF,
-    0xE7FE,
-    0xD79D,
-    0xC7BC,
-    0x48C4,
-    0x58E5,
-    0x6886,
-    0x78A7,
-    0x0840,
-    0x1861,
-    0x2802,
-    0x3823,
-    0xC9CC,
-    0xD9ED,
-    0xE98E,
-    0xF9AF,
-    0x8948,
-    0x9969,
-    0xA90A,
-    0xB92B,
-    0x5AF5,
-    0x4AD4,
-    0x7AB7,
-    0x6A96,
-    0x1A71,
-    0x0A50,
-    0x3A33,
-    0x2A12,
-    0xDBFD,
-    0xCBDC,
-    0xFBBF,
-    0xEB9E,
-    0x9B79,
-    0x8B58,
-    0xBB3B,
-    0xAB1A,
-    0x6CA6,
-    0x7C87,
-    0x4CE4,
-    0x5CC5,
-    0x2C22,
-    0x3C03,
-    0x0C60,
-    0x1C41,
-    0xEDAE,
-    0xFD8F,
-    0xCDEC,
-    0xDDCD,
-    0xAD2A,
-    0xBD0B,
-    0x8D68,
-    0x9D49,
-    0x7E97,
-    0x6EB6,
-    0x5ED5,
-    0x4EF4,
-    0x3E13,
-    0x2E32,
-    0x1E51,
-    0x0E70,
-    0xFF9F,
-    0xEFBE,
-    0xDFDD,
-    0xCFFC,
-    0xBF1B,
-    0xAF3A,
-    0x9F59,
-    0x8F78,
-    0x9188,
-    0x81A9,
-    0xB1CA,
-    0xA1EB,
-    0xD10C,
-    0xC12D,
-    0xF14E,
-    0xE16F,
-    0x1080,
-    0x00A1,
-    0x30C2,
-    0x20E3,
-    0x5004,
-    0x4025,
-    0x7046,
-    0x6067,
-    0x83B9,
-    0x9398,
-    0xA3FB,
-    0xB3DA,
-    0xC33D,
-    0xD31C,
-    0xE37F,
-    0xF35E,
-    0x02B1,
-    0x1290,
-    0x22F3,
-    0x32D2,
-    0x4235,
-    0x5214,
-    0x6277,
-    0x7256,
-    0xB5EA,
-    0xA5CB,
-    0x95A8,
-    0x8589,
-    0xF56E,
-    0xE54F,
-    0xD52C,
-    0xC50D,
-    0x34E2,
-    0x24C3,
-    0x14A0,
-    0x0481,
-    0x7466,
-    0x6447,
-    0x5424,
-    0x4405,
-    0xA7DB,
-    0xB7FA,
-    0x8799,
-    0x97B8,
-    0xE75F,
-    0xF77E,
-    0xC71D,
-    0xD73C,
-    0x26D3,
-    0x36F2,
-    0x0691,
-    0x16B0,
-    0x6657,
-    0x7676,
-    0x4615,
-    0x5634,
-    0xD94C,
-    0xC96D,
-    0xF90E,
-    0xE92F,
-    0x99C8,
-    0x89E9,
-    0xB98A,
-    0xA9AB,
-    0x5844,
-    0x4865,
-    0x7806,
-    0x6827,
-    0x18C0,
-    0x08E1,
-    0x3882,
-    0x28A3,
-    0xCB7D,
-    0xDB5C,
-    0xEB3F,
-    0xFB1E,
-    0x8BF9,
-    0x9BD8,
-    0xABBB,
-    0xBB9A,
-    0x4A75,
-    0x5A54,
-    0x6A37,
-    0x7A16,
-    0x0AF1,
-    0x1AD0,
-    0x2AB3,
-    0x3A92,
-    0xFD2E,
-    0xED0F,
-    0xDD6C,
-    0xCD4D,
-    0xBDAA,
-    0xAD8B,
-    0x9DE8,
-    0x8DC9,
-    0x7C26,
-    0x6C07,
-    0x5C64,
-    0x4C45,
-    0x3CA2,
-    0x2C83,
-    0x1CE0,
-    0x0CC1,
-    0xEF1F,
-    0xFF3E,
-    0xCF5D,
-    0xDF7C,
-    0xAF9B,
-    0xBFBA,
-    0x8FD9,
-    0x9FF8,
-    0x6E17,
-    0x7E36,
-    0x4E55,
-    0x5E74,
-    0x2E93,
-    0x3EB2,
-    0x0ED1,
-    0x1EF0,
-]
+# frame data length is a single byte
+MAX_FRAME_DATA_LENGTH = 255
+# ATT header taken out of the MTU for every write
+ATT_HEADER_LENGTH = 3
 
 
 class BleMessage:
@@ -300,6 +46,10 @@ class BleMessage:
     mChecksum = False
     mRequireAck = False
     mConnectState = 0
+    # use write without response when the characteristic supports it
+    mWriteWithoutResponse = True
+    # seconds between fragments, only needed for links that drop back to back writes
+    mFragmentInterval = 0.0
 
     def __init__(self, client: BleakClient) -> None:
         self.client = client
@@ -307,6 +57,11 @@ class BleMessage:
         self.mReadSequence = AtomicInteger(-1)
         self.mAck = queue.Queue()
         self.notification = BlufiNotifyData()
+        self.write_stats = BleWriteStats()
+        # frames are built in place here, grown if the MTU goes up
+        self._frame_buffer = bytearray(self.DEFAULT_PACKAGE_LENGTH)
+        # commands can be in flight together, but their fragments must not interleave
+        self._write_lock = Lock()
 
     async def get_task(self) -> None:
         hash_map = {"pver": 1, "subCmd": 2, "result": 0}
@@ -331,8 +86,7 @@ class BleMessage:
             return ""
 
     def clear_notification(self) -> None:
-        self.notification = None
-        self.notification = BlufiNotifyData()
+        self.notification.reset()
 
     # async def get_device_info(self):
     #     await self.postCustomData(self.getJsonString(bleOrderCmd.getDeviceInfo))
@@ -380,10 +134,38 @@ class BleMessage:
     async def sendBorderPackage(self, executeBorder: ExecuteBorder) -> None:
         await self.post_custom_data(serialize(executeBorder))
 
-    async def gatt_write(self, data: bytes) -> None:
-        await self.client.write_gatt_char(UUID_WRITE_CHARACTERISTIC, data, True)
+    def _write_characteristic(self):
+        try:
+            return self.client.services.get_characteristic(UUID_WRITE_CHARACTERISTIC)
+        except Exception:  # services not resolved yet
+            return None
+
+    def _use_write_without_response(self) -> bool:
+        characteristic = self._write_characteristic()
+        return (
+            self.mWriteWithoutResponse
+            and characteristic is not None
+            and "write-without-response" in characteristic.properties
+        )
 
-    def parseNotification(self, response: bytearray):
+    def package_length_limit(self, without_response: bool = False) -> int:
+        """Return the largest frame we can write in one go."""
+        if self.mPackageLengthLimit > 0:
+            return self.mPackageLengthLimit
+        if self.mBlufiMTU > 0:
+            return self.mBlufiMTU
+        if without_response and (characteristic := self._write_characteristic()) is not None:
+            return max(characteristic.max_write_without_response_size, self.MIN_PACKAGE_LENGTH)
+        mtu = getattr(self.client, "mtu_size", 0)
+        if mtu > ATT_HEADER_LENGTH:
+            return max(mtu - ATT_HEADER_LENGTH, self.MIN_PACKAGE_LENGTH)
+        return self.DEFAULT_PACKAGE_LENGTH
+
+    async def gatt_write(self, data: bytes | bytearray | memoryview, response: bool = True) -> bool:
+        await self.client.write_gatt_char(UUID_WRITE_CHARACTERISTIC, data, response)
+        return True
+
+    def parseNotification(self, response: bytes | bytearray):
         """Parse notification data from BLE device."""
         if response is None:
             # Log.w(TAG, "parseNotification null data");
@@ -429,7 +211,8 @@ class BleMessage:
         dataLen = int(response[3])  # toInt specifies length of data
 
         try:
-            dataBytes = response[4 : 4 + dataLen]
+            # view into the notification, only copied once into the reassembly buffer
+            dataBytes = memoryview(response)[4 : 4 + dataLen]
             if frameCtrlData.isEncrypted():
                 _LOGGER.debug("is encrypted")
             #     BlufiAES aes = new BlufiAES(self.mAESKey, AES_TRANSFORMATION, generateAESIV(sequence));
@@ -438,7 +221,7 @@ class BleMessage:
             if frameCtrlData.isChecksum():
                 respChecksum1 = int(response[-1])
                 respChecksum2 = int(response[-2])
-                crc = self.calc_crc(self.calc_crc(0, bytes([sequence, dataLen])), dataBytes)
+                crc = Crc16().update(bytes((sequence, dataLen))).update(dataBytes).value
                 calcChecksum1 = (crc >> 8) & 255
                 calcChecksum2 = crc & 255
 
@@ -577,10 +360,11 @@ class BleMessage:
         type_of: int,
         data: bytes,
     ) -> bool:
-        if data is None:
-            return await self.post_non_data(encrypt, checksum, require_ack, type_of)
+        async with self._write_lock:
+            if data is None:
+                return await self.post_non_data(encrypt, checksum, require_ack, type_of)
 
-        return await self.post_contains_data(encrypt, checksum, require_ack, type_of, data)
+            return await self.post_contains_data(encrypt, checksum, require_ack, type_of, data)
 
     async def post_non_data(self, encrypt: bool, checksum: bool, require_ack: bool, type_of: int) -> bool:
         sequence = self.generate_send_sequence()
@@ -596,36 +380,81 @@ class BleMessage:
         type_of: int,
         data: bytes,
     ) -> bool:
-        chunk_size = 517  # self.client.mtu_size - 3
-
-        chunks = list()
-        for i in range(0, len(data), chunk_size):
-            if i + chunk_size > len(data):
-                chunks.append(data[i : len(data)])
-            else:
-                chunks.append(data[i : i + chunk_size])
-        for index, chunk in enumerate(chunks):
-            frag = index != len(chunks) - 1
+        """Send data split into as few frames as the MTU allows, every frame back to back."""
+        without_response = self._use_write_without_response()
+        frame_limit = self.package_length_limit(without_response)
+        checksum_length = 2 if checksum else 0
+        content_limit = min(frame_limit - self.PACKAGE_HEADER_LENGTH - checksum_length, MAX_FRAME_DATA_LENGTH)
+        if len(self._frame_buffer) < frame_limit:
+            self._frame_buffer = bytearray(frame_limit)
+        frame = memoryview(self._frame_buffer)
+
+        view = memoryview(data)
+        position = 0
+        frames = 0
+        started = time.perf_counter()
+        while True:
+            remaining = len(view) - position
+            # fragments carry the length still to come in their first 2 bytes
+            frag = remaining > content_limit
+            chunk = view[position : position + (content_limit - 2 if frag else remaining)]
             sequence = self.generate_send_sequence()
-            postBytes = self.getPostBytes(type_of, encrypt, checksum, require_ack, frag, sequence, chunk)
-            # _LOGGER.debug("sequence")
-            # _LOGGER.debug(sequence)
-            posted = await self.gatt_write(postBytes)
-            if posted is not None:
-                return False
+            length = self._build_frame(frame, type_of, encrypt, checksum, require_ack, sequence, chunk, remaining, frag)
+            await self.gatt_write(frame[:length], not without_response)
+            frames += 1
+            position += len(chunk)
 
             if not frag:
+                self.write_stats.record(len(view), frames, time.perf_counter() - started)
+                _LOGGER.debug(
+                    "Sent %s bytes in %s frames at %.0f B/s",
+                    len(view),
+                    frames,
+                    self.write_stats.last_throughput,
+                )
                 return not require_ack or self.receiveAck(sequence)
 
             if require_ack and not self.receiveAck(sequence):
                 return False
+            if self.mFragmentInterval > 0:
+                await sleep(self.mFragmentInterval)
 
-            _LOGGER.debug("sleeping 0.01")
-            await sleep(0.01)
-            if require_ack and not self.receiveAck(sequence):
-                return False
-            else:
-                return True
+    @staticmethod
+    def _build_frame(
+        frame: memoryview,
+        type_of: int,
+        encrypt: bool,
+        checksum: bool,
+        require_ack: bool,
+        sequence: int,
+        chunk: memoryview | bytes,
+        remaining: int,
+        frag: bool,
+    ) -> int:
+        """Write one frame into frame and return its length."""
+        data_length = len(chunk) + (2 if frag else 0)
+        frame[0] = type_of
+        frame[1] = FrameCtrlData.getFrameCTRLValue(encrypt, checksum, 0, require_ack, frag)
+        frame[2] = sequence
+        frame[3] = data_length
+        offset = BleMessage.PACKAGE_HEADER_LENGTH
+        if frag:
+            frame[offset] = remaining & 255
+            frame[offset + 1] = (remaining >> 8) & 255
+            offset += 2
+        frame[offset : offset + len(chunk)] = chunk
+        offset += len(chunk)
+        if checksum:
+            crc = (
+                Crc16()
+                .update(bytes((sequence, data_length)))
+                .update(frame[BleMessage.PACKAGE_HEADER_LENGTH : offset])
+                .value
+            )
+            frame[offset] = crc & 255
+            frame[offset + 1] = (crc >> 8) & 255
+            offset += 2
+        return offset
 
     def getPostBytes(
         self,
@@ -637,22 +466,15 @@ class BleMessage:
         sequence: int,
         data: bytes | None,
     ) -> bytes:
-        byteOS = BytesIO()
-        dataLength = 0 if data == None else len(data)
-        frameCtrl = FrameCtrlData.getFrameCTRLValue(encrypt, checksum, 0, require_ack, hasFrag)
-        byteOS.write(type.to_bytes(1, sys.byteorder))
-        byteOS.write(frameCtrl.to_bytes(1, sys.byteorder))
-        byteOS.write(sequence.to_bytes(1, sys.byteorder))
-        byteOS.write(dataLength.to_bytes(1, sys.byteorder))
-
-        if data is not None:
-            byteOS.write(data)
-
-        _LOGGER.debug(byteOS.getvalue())
-        return byteOS.getvalue()
+        data = b"" if data is None else data
+        frame = bytearray(self.PACKAGE_HEADER_LENGTH + len(data) + 2 * (hasFrag + checksum))
+        length = self._build_frame(
+            memoryview(frame), type, encrypt, checksum, require_ack, sequence, data, len(data), hasFrag
+        )
+        return bytes(frame[:length])
 
     @staticmethod
-    def calc_crc(initial: int, data: bytes | bytearray) -> int:
+    def calc_crc(initial: int, data: bytes | bytearray | memoryview) -> int:
         """Calculate CRC value for given initial value and byte array.
 
         Args:
@@ -663,24 +485,14 @@ class BleMessage:
             Calculated CRC value (16-bit)
 
         Raises:
-            TypeError: If data is not bytes or bytearray
+            TypeError: If data is not bytes, bytearray or memoryview
             ValueError: If initial value is out of valid range
 
         """
-        if not isinstance(data, (bytes, bytearray)):
-            raise TypeError("Data must be bytes or bytearray")
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            raise TypeError("Data must be bytes, bytearray or memoryview")
 
         if not 0 <= initial <= 0xFFFF:
             raise ValueError("Initial value must be between 0 and 65535")
 
-        try:
-            crc = (~initial) & 0xFFFF
-
-            for byte in data:
-                crc = ((crc << 8) ^ CRC_TB[byte ^ (crc >> 8)]) & 0xFFFF
-
-            return (~crc) & 0xFFFF
-
-        except Exception as e:
-            _LOGGER.error("Error calculating CRC: %s", str(e))
-            raise
+        return calc_crc(initial, data)
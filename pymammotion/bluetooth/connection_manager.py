@@ -0,0 +1,142 @@
+"""Share BLE adapters between mowers and keep recently used connections warm."""
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class _Connection:
+    address: str
+    adapter: str
+    disconnect: Callable[[], Awaitable[None]]
+
+
+class BleConnectionManager:
+    """Assign mowers to HCI adapters and decide which connections stay open.
+
+    Each adapter holds at most ``max_connections_per_adapter`` connections.
+    A mower keeps using the adapter it last connected through while there
+    is room on it. Otherwise it goes to the least loaded adapter. When every
+    adapter is full, the least recently used connection that is not busy is
+    disconnected to make room, and if every connection is busy the caller
+    waits for one to close.
+
+    Connections stay open between commands. ``idle_timeout`` is how long
+    an unused connection lives, or None to keep it until it is evicted.
+    ``max_warm_connections`` caps the open connections across all adapters.
+    """
+
+    def __init__(
+        self,
+        adapters: Sequence[str] = ("hci0",),
+        max_connections_per_adapter: int = 5,
+        max_warm_connections: int | None = None,
+        idle_timeout: float | None = 60.0,
+    ) -> None:
+        if not adapters:
+            raise ValueError("At least one adapter is required")
+        self.adapters = list(adapters)
+        self.max_connections_per_adapter = max_connections_per_adapter
+        self.max_warm_connections = max_warm_connections
+        self.idle_timeout = idle_timeout
+        # least recently used first
+        self._connections: OrderedDict[str, _Connection] = OrderedDict()
+        self._in_use: dict[str, int] = {}
+        self._last_adapter: dict[str, str] = {}
+        self._evicting: set[str] = set()
+        self._released = asyncio.Event()
+
+    def adapter_for(self, address: str) -> str | None:
+        """Return the adapter a mower is connected or connecting through."""
+        if connection := self._connections.get(address):
+            return connection.adapter
+        return None
+
+    def connection_count(self, adapter: str) -> int:
+        return sum(1 for connection in self._connections.values() if connection.adapter == adapter)
+
+    def _free_adapter(self, address: str) -> str | None:
+        last = self._last_adapter.get(address)
+        if last in self.adapters and self.connection_count(last) < self.max_connections_per_adapter:
+            return last
+        counts = {adapter: self.connection_count(adapter) for adapter in self.adapters}
+        adapter = min(self.adapters, key=counts.__getitem__)
+        return adapter if counts[adapter] < self.max_connections_per_adapter else None
+
+    def _idle_connection(self) -> _Connection | None:
+        """Return the least recently used connection nothing is using."""
+        return next(
+            (
+                connection
+                for address, connection in self._connections.items()
+                if not self._in_use.get(address) and address not in self._evicting
+            ),
+            None,
+        )
+
+    async def _evict(self, connection: _Connection) -> None:
+        _LOGGER.debug("Evicting BLE connection to %s on %s", connection.address, connection.adapter)
+        self._evicting.add(connection.address)
+        try:
+            await connection.disconnect()
+        except Exception:
+            _LOGGER.debug("Error evicting BLE connection to %s", connection.address, exc_info=True)
+        finally:
+            self._evicting.discard(connection.address)
+            # in case the device did not release it while disconnecting
+            self.release(connection.address)
+
+    async def acquire(self, address: str, disconnect: Callable[[], Awaitable[None]]) -> str:
+        """Reserve a connection slot for a mower and return the adapter to connect through.
+
+        ``disconnect`` is awaited when the connection is evicted. Call
+        release() once the mower disconnects or connecting fails.
+        """
+        while True:
+            if connection := self._connections.get(address):
+                connection.disconnect = disconnect
+                self._connections.move_to_end(address)
+                return connection.adapter
+
+            adapter = self._free_adapter(address)
+            pool_full = (
+                self.max_warm_connections is not None and len(self._connections) >= self.max_warm_connections
+            )
+            if adapter is not None and not pool_full:
+                self._connections[address] = _Connection(address, adapter, disconnect)
+                self._last_adapter[address] = adapter
+                return adapter
+
+            if (idle := self._idle_connection()) is not None:
+                await self._evict(idle)
+                continue
+
+            _LOGGER.debug("All BLE connections are busy, %s is waiting for a connection slot", address)
+            self._released.clear()
+            await self._released.wait()
+
+    def release(self, address: str) -> None:
+        """Forget a mower's connection, e.g. once it disconnected."""
+        if self._connections.pop(address, None) is not None:
+            self._released.set()
+
+    @asynccontextmanager
+    async def use(self, address: str) -> AsyncIterator[None]:
+        """Mark a mower's connection busy so it is not evicted meanwhile."""
+        self._in_use[address] = self._in_use.get(address, 0) + 1
+        if address in self._connections:
+            self._connections.move_to_end(address)
+        try:
+            yield
+        finally:
+            self._in_use[address] -= 1
+            if self._in_use[address] == 0:
+                del self._in_use[address]
+                # a mower may be waiting for this connection to become evictable
+                self._released.set()
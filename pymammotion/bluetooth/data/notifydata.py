@@ -1,5 +1,3 @@
-from io import BytesIO
-
 """Notify data object"""
 
 
@@ -7,7 +5,9 @@ class BlufiNotifyData:
     """generated source for class BlufiNotifyData"""
 
     def __init__(self) -> None:
-        self.mDataOS = BytesIO()
+        # payload is reassembled in place, sized from the first fragment
+        self.mData: bytearray | None = None
+        self.mDataLength = 0
         self.mFrameCtrlValue = 0
         self.mPkgType = 0
         self.mSubType = 0
@@ -52,11 +52,39 @@ class BlufiNotifyData:
         self.mFrameCtrlValue = i
 
     #  JADX INFO: Access modifiers changed from: package-private
-    def addData(self, bArr, i) -> None:
-        """Generated source for method addData"""
-        self.mDataOS.write(bArr[i:])
+    def addData(self, bArr: bytes | bytearray | memoryview, i: int) -> None:
+        """Copy the frame data after offset i into the payload buffer.
+
+        Fragmented frames start with 2 bytes (little endian) giving the length
+        of the payload still to come, so the first one sizes the buffer.
+        """
+        view = memoryview(bArr)[i:]
+        if self.mData is None:
+            size = int.from_bytes(bArr[0:2], "little") if i == 2 else len(view)
+            self.mData = bytearray(max(size, len(view)))
+        end = self.mDataLength + len(view)
+        if end > len(self.mData):
+            # device sent more than announced, grow rather than drop it
+            self.mData.extend(bytes(end - len(self.mData)))
+        self.mData[self.mDataLength : end] = view
+        self.mDataLength = end
+
+    def getDataView(self) -> memoryview:
+        """Return the payload received so far without copying it."""
+        if self.mData is None:
+            return memoryview(b"")
+        return memoryview(self.mData)[: self.mDataLength]
 
     #  JADX INFO: Access modifiers changed from: package-private
-    def getDataArray(self):
-        """Generated source for method getDataArray"""
-        return self.mDataOS.getvalue()
+    def getDataArray(self) -> bytes:
+        """Return the payload as bytes, the protobuf parser needs immutable bytes."""
+        if self.mData is None:
+            return b""
+        if self.mDataLength == len(self.mData):
+            return bytes(self.mData)
+        return bytes(self.getDataView())
+
+    def reset(self) -> None:
+        """Forget the payload so the next message starts a new buffer."""
+        self.mData = None
+        self.mDataLength = 0
@@ -0,0 +1,33 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class BleWriteStats:
+    """Throughput of the BLE writes, for the last payload and since connecting."""
+
+    payloads: int = 0
+    frames: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    last_bytes: int = 0
+    last_frames: int = 0
+    last_seconds: float = 0.0
+
+    def record(self, payload_bytes: int, frames: int, seconds: float) -> None:
+        self.payloads += 1
+        self.frames += frames
+        self.bytes += payload_bytes
+        self.seconds += seconds
+        self.last_bytes = payload_bytes
+        self.last_frames = frames
+        self.last_seconds = seconds
+
+    @property
+    def last_throughput(self) -> float:
+        """Bytes per second of the last payload."""
+        return self.last_bytes / self.last_seconds if self.last_seconds > 0 else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Average bytes per second over every payload."""
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
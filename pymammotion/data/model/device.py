@@ -1,6 +1,7 @@
 """MowingDevice class to wrap around the betterproto dataclasses."""
 
 from dataclasses import dataclass, field
+from functools import cached_property
 
 import betterproto
 from mashumaro.mixins.orjson import DataClassORJSONMixin
@@ -15,7 +16,9 @@ from pymammotion.http.model.http import ErrorInfo
 from pymammotion.proto import DeviceFwInfo, MowToAppInfoT, ReportInfoData, SystemRapidStateTunnelMsg, SystemUpdateBufMsg
 from pymammotion.utility.constant import WorkMode
 from pymammotion.utility.conversions import parse_double
-from pymammotion.utility.map import CoordinateConverter
+from pymammotion.utility.map import get_coordinate_converter
+from pymammotion.utility.map_geometry import map_geometry
+from pymammotion.utility.spatial_index import MapPosition, MapSpatialIndex
 
 
 @dataclass
@@ -80,7 +83,7 @@ class MowingDevice(DataClassORJSONMixin):
                 )
 
     def update_report_data(self, toapp_report_data: ReportInfoData) -> None:
-        coordinate_converter = CoordinateConverter(self.location.RTK.latitude, self.location.RTK.longitude)
+        coordinate_converter = get_coordinate_converter(self.location.RTK.latitude, self.location.RTK.longitude)
         for index, location in enumerate(toapp_report_data.locations):
             if index == 0 and location.real_pos_y != 0:
                 self.location.position_type = location.pos_type
@@ -99,7 +102,7 @@ class MowingDevice(DataClassORJSONMixin):
         self.report_data.update(toapp_report_data.to_dict(casing=betterproto.Casing.SNAKE))
 
     def run_state_update(self, rapid_state: SystemRapidStateTunnelMsg) -> None:
-        coordinate_converter = CoordinateConverter(self.location.RTK.latitude, self.location.RTK.longitude)
+        coordinate_converter = get_coordinate_converter(self.location.RTK.latitude, self.location.RTK.longitude)
         self.mowing_state = RapidState().from_raw(rapid_state.rapid_state_data)
         self.location.position_type = self.mowing_state.pos_type
         self.location.orientation = int(self.mowing_state.toward / 10000)
@@ -117,6 +120,25 @@ class MowingDevice(DataClassORJSONMixin):
     def report_missing_data(self) -> None:
         """Report missing data so we can refetch it."""
 
+    def map_geojson(self) -> dict:
+        """Return the map as a GeoJSON FeatureCollection."""
+        return map_geometry.to_geojson(self.map, self.location.RTK)
+
+    def map_wkb(self) -> dict[int, bytes]:
+        """Return WKB for each area, obstacle, dump and path keyed by hash."""
+        return map_geometry.to_wkb(self.map, self.location.RTK)
+
+    @cached_property
+    def spatial_index(self) -> MapSpatialIndex:
+        """Index over the map's areas and obstacles, not serialised."""
+        return MapSpatialIndex()
+
+    def map_position(self) -> MapPosition:
+        """Return the area, obstacle and nearest boundary for the last reported position."""
+        return self.spatial_index.locate(
+            self.map, parse_double(self.mowing_state.pos_x, 4.0), parse_double(self.mowing_state.pos_y, 4.0)
+        )
+
     def update_device_firmwares(self, fw_info: DeviceFwInfo) -> None:
         """Sets firmware versions on all parts of the robot or RTK."""
         for mod in fw_info.mod:
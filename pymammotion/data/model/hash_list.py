@@ -1,11 +1,22 @@
+from array import array
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass, field
 from enum import IntEnum
+import itertools
+from typing import Any
 
+from mashumaro.config import BaseConfig
 from mashumaro.mixins.orjson import DataClassORJSONMixin
+from mashumaro.types import SerializableType
+import orjson
 
 from pymammotion.proto import NavGetCommDataAck, SvgMessageAckT
 
 
+# unique across every FrameList so a (hash, version) pair always identifies the same frames
+_frame_list_versions = itertools.count(1)
+
+
 class PathType(IntEnum):
     """Path types for common data."""
 
@@ -22,6 +33,84 @@ class CommDataCouple:
     y: float = 0.0
 
 
+class CoordinateArray(SerializableType):
+    """Map points stored as interleaved x, y doubles in one contiguous array.
+
+    Behaves as a read only sequence of CommDataCouple so existing
+    ``data_couple`` readers keep working, while ``xs``/``ys`` give the
+    coordinates without creating a Python object per point.
+    Serialises as a flat [x0, y0, x1, y1, ...] list, the old list of
+    {"x", "y"} dicts is still accepted when loading.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Iterable[float] = ()) -> None:
+        self._data = data if isinstance(data, array) and data.typecode == "d" else array("d", data)
+
+    @classmethod
+    def from_couples(cls, couples: Iterable[Any]) -> "CoordinateArray":
+        """Build from anything with x and y attributes, e.g. the CommDataCouple of a protobuf ack."""
+        data = array("d")
+        for couple in couples:
+            data.append(couple.x)
+            data.append(couple.y)
+        return cls(data)
+
+    @property
+    def data(self) -> array:
+        """The interleaved x, y array."""
+        return self._data
+
+    @property
+    def xs(self) -> memoryview:
+        return memoryview(self._data)[0::2]
+
+    @property
+    def ys(self) -> memoryview:
+        return memoryview(self._data)[1::2]
+
+    def append(self, couple: CommDataCouple) -> None:
+        self._data.append(couple.x)
+        self._data.append(couple.y)
+
+    def __len__(self) -> int:
+        return len(self._data) // 2
+
+    def __getitem__(self, index: int) -> CommDataCouple:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("coordinate index out of range")
+        return CommDataCouple(self._data[2 * index], self._data[2 * index + 1])
+
+    def __iter__(self) -> Iterator[CommDataCouple]:
+        data = self._data
+        for index in range(0, len(data), 2):
+            yield CommDataCouple(data[index], data[index + 1])
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CoordinateArray):
+            return self._data == other._data
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CoordinateArray({len(self)} points)"
+
+    def _serialize(self) -> list[float]:
+        return self._data.tolist()
+
+    @classmethod
+    def _deserialize(cls, value: list[float] | list[dict[str, float]]) -> "CoordinateArray":
+        if value and isinstance(value[0], dict):
+            data = array("d")
+            for couple in value:
+                data.append(couple.get("x", 0.0))
+                data.append(couple.get("y", 0.0))
+            return cls(data)
+        return cls(value)
+
+
 @dataclass
 class AreaLabelName(DataClassORJSONMixin):
     label: str = ""
@@ -41,10 +130,35 @@ class NavGetCommData(DataClassORJSONMixin):
     current_frame: int = 0
     data_hash: int = 0
     data_len: int = 0
-    data_couple: list["CommDataCouple"] = field(default_factory=list)
+    data_couple: CoordinateArray = field(default_factory=CoordinateArray)
     reserved: str = ""
     area_label: "AreaLabelName" = field(default_factory=AreaLabelName)
 
+    def __post_init__(self) -> None:
+        if not isinstance(self.data_couple, CoordinateArray):
+            self.data_couple = CoordinateArray.from_couples(self.data_couple)
+
+    @classmethod
+    def from_ack(cls, ack: NavGetCommDataAck) -> "NavGetCommData":
+        """Build from the protobuf ack without going through an intermediate dict."""
+        return cls(
+            pver=ack.pver,
+            sub_cmd=ack.sub_cmd,
+            result=ack.result,
+            action=ack.action,
+            type=ack.type,
+            hash=ack.hash,
+            paternal_hash_a=ack.paternal_hash_a,
+            paternal_hash_b=ack.paternal_hash_b,
+            total_frame=ack.total_frame,
+            current_frame=ack.current_frame,
+            data_hash=ack.data_hash,
+            data_len=ack.data_len,
+            data_couple=CoordinateArray.from_couples(ack.data_couple),
+            reserved=ack.reserved,
+            area_label=AreaLabelName(label=ack.area_label.label),
+        )
+
 
 @dataclass
 class SvgMessageData(DataClassORJSONMixin):
@@ -75,11 +189,44 @@ class SvgMessage(DataClassORJSONMixin):
     result: int = 0
     svg_message: "SvgMessageData" = field(default_factory=SvgMessageData)
 
+    class Config(BaseConfig):
+        # lets FrameList tell svg frames apart from common data frames when deserialising
+        forbid_extra_keys = True
+
 
 @dataclass
 class FrameList(DataClassORJSONMixin):
     total_frame: int
-    data: list[NavGetCommData | SvgMessage]
+    data: list[SvgMessage | NavGetCommData]
+
+    def __post_init__(self) -> None:
+        # bit n is set once frame n has arrived, not serialised so rebuilt from data
+        self.received = 0
+        for frame in self.data:
+            self.received |= 1 << frame.current_frame
+        # changes whenever a frame is added, lets derived data such as geometry be memoised
+        self.version = next(_frame_list_versions)
+
+    def has_frame(self, current_frame: int) -> bool:
+        return bool(self.received >> current_frame & 1)
+
+    def add(self, frame: NavGetCommData | SvgMessage) -> bool:
+        """Add a frame, returns False if it was already received."""
+        if self.has_frame(frame.current_frame):
+            return False
+        self.data.append(frame)
+        self.received |= 1 << frame.current_frame
+        self.version = next(_frame_list_versions)
+        return True
+
+    @property
+    def complete(self) -> bool:
+        return self.received >> 1 == (1 << self.total_frame) - 1
+
+    @property
+    def missing_frames(self) -> list[int]:
+        """Return the frame numbers (1 based) that have not arrived yet."""
+        return [num for num in range(1, self.total_frame + 1) if not self.received >> num & 1]
 
 
 @dataclass(eq=False, repr=False)
@@ -111,6 +258,16 @@ class AreaHashNameList(DataClassORJSONMixin):
     hash: int
 
 
+# map data type -> HashList attribute holding its frames
+PATH_TYPE_FIELDS = {
+    PathType.AREA: "area",
+    PathType.OBSTACLE: "obstacle",
+    PathType.PATH: "path",
+    PathType.DUMP: "dump",
+    PathType.SVG: "svg",
+}
+
+
 @dataclass
 class HashList(DataClassORJSONMixin):
     """stores our map data.
@@ -119,19 +276,44 @@ class HashList(DataClassORJSONMixin):
     """
 
     root_hash_list: RootHashList = field(default_factory=RootHashList)
-    area: dict = field(default_factory=dict)  # type 0
-    path: dict = field(default_factory=dict)  # type 2
-    obstacle: dict = field(default_factory=dict)  # type 1
-    dump: dict = field(default_factory=dict)  # type 12?
-    svg: dict = field(default_factory=dict)  # type 13
+    area: dict[int, FrameList] = field(default_factory=dict)  # type 0
+    path: dict[int, FrameList] = field(default_factory=dict)  # type 2
+    obstacle: dict[int, FrameList] = field(default_factory=dict)  # type 1
+    dump: dict[int, FrameList] = field(default_factory=dict)  # type 12?
+    svg: dict[int, FrameList] = field(default_factory=dict)  # type 13
     area_name: list[AreaHashNameList] = field(default_factory=list)
 
+    class Config(BaseConfig):
+        # hashes are int keys
+        orjson_options = orjson.OPT_NON_STR_KEYS
+
+    def __post_init__(self) -> None:
+        # hash -> (type, frames) across all types and the hashes of the root list with no frames yet,
+        # neither is serialised so both are rebuilt here after deserialising
+        self._index: dict[int, tuple[PathType, FrameList]] = {
+            hash_id: (path_type, frames)
+            for path_type, name in PATH_TYPE_FIELDS.items()
+            for hash_id, frames in getattr(self, name).items()
+        }
+        self._incomplete: set[int] = {hash_id for hash_id, (_, frames) in self._index.items() if not frames.complete}
+        self._rebuild_missing()
+
+    def _rebuild_missing(self) -> None:
+        # dict as an insertion ordered set, keeps the root list order
+        self._missing: dict[int, None] = dict.fromkeys(
+            hash_id for hash_id in self.hashlist if hash_id not in self._index
+        )
+
     def update_hash_lists(self, hashlist: list[int]) -> None:
-        self.area = {hash_id: frames for hash_id, frames in self.area.items() if hash_id in hashlist}
-        self.path = {hash_id: frames for hash_id, frames in self.path.items() if hash_id in hashlist}
-        self.obstacle = {hash_id: frames for hash_id, frames in self.obstacle.items() if hash_id in hashlist}
-        self.dump = {hash_id: frames for hash_id, frames in self.dump.items() if hash_id in hashlist}
-        self.svg = {hash_id: frames for hash_id, frames in self.svg.items() if hash_id in hashlist}
+        """Drop map data for hashes that are no longer in ``hashlist``."""
+        keep = set(hashlist)
+        for path_type, name in PATH_TYPE_FIELDS.items():
+            frames_by_hash: dict[int, FrameList] = getattr(self, name)
+            for hash_id in [hash_id for hash_id in frames_by_hash if hash_id not in keep]:
+                del frames_by_hash[hash_id]
+                self._index.pop(hash_id, None)
+                self._incomplete.discard(hash_id)
+        self._rebuild_missing()
 
     @property
     def hashlist(self) -> list[int]:
@@ -141,16 +323,29 @@ class HashList(DataClassORJSONMixin):
 
     @property
     def missing_hashlist(self) -> list[int]:
-        """Return missing hashlist."""
-        return [
-            i
-            for obj in self.root_hash_list.data
-            for i in obj.data_couple
-            if f"{i}"
-            not in set(self.area.keys()).union(
-                self.path.keys(), self.obstacle.keys(), self.dump.keys(), self.svg.keys()
-            )
-        ]
+        """Return the hashes in the root hash list we have no frames for."""
+        return list(self._missing)
+
+    @property
+    def incomplete_hashes(self) -> list[tuple[int, PathType, FrameList]]:
+        """Return (hash, type, frames) for every hash that has some but not all of its frames."""
+        return [(hash_id, *self._index[hash_id]) for hash_id in self._incomplete]
+
+    @property
+    def hash_ids(self) -> list[int]:
+        """Return every hash we have frames for."""
+        return list(self._index)
+
+    def hash_type(self, hash_id: int) -> PathType | None:
+        if entry := self._index.get(hash_id):
+            return entry[0]
+        return None
+
+    def frame_list(self, hash_id: int) -> FrameList | None:
+        """Return the frames received for a hash of any type."""
+        if entry := self._index.get(hash_id):
+            return entry[1]
+        return None
 
     def update_root_hash_list(self, hash_list: NavGetHashListData) -> None:
         self.root_hash_list.total_frame = hash_list.total_frame
@@ -158,55 +353,49 @@ class HashList(DataClassORJSONMixin):
         for index, obj in enumerate(self.root_hash_list.data):
             if obj.current_frame == hash_list.current_frame:
                 # Replace the item if current_frame matches
+                for hash_id in obj.data_couple:
+                    self._missing.pop(hash_id, None)
                 self.root_hash_list.data[index] = hash_list
-                return
+                break
+        else:
+            # If no match was found, append the new item
+            self.root_hash_list.data.append(hash_list)
+
+        for hash_id in hash_list.data_couple:
+            if hash_id not in self._index:
+                self._missing[hash_id] = None
 
-        # If no match was found, append the new item
-        self.root_hash_list.data.append(hash_list)
+        if len(self.missing_hash_frame()) == 0:
+            # root list is complete, anything not in it was removed or changed on the mower
+            self.update_hash_lists(self.hashlist)
+
+    def reset_root_hash_list(self) -> None:
+        """Forget the root hash list but keep the frames, e.g. for map data restored from a cache."""
+        self.root_hash_list = RootHashList()
+        self._rebuild_missing()
 
     def missing_hash_frame(self) -> list[int]:
         return self._find_missing_frames(self.root_hash_list)
 
     def missing_frame(self, hash_data: NavGetCommDataAck | SvgMessageAckT) -> list[int]:
-        if hash_data.type == PathType.AREA:
-            return self._find_missing_frames(self.area.get(hash_data.hash))
-
-        if hash_data.type == PathType.OBSTACLE:
-            return self._find_missing_frames(self.obstacle.get(hash_data.hash))
-
-        if hash_data.type == PathType.PATH:
-            return self._find_missing_frames(self.path.get(hash_data.hash))
-
-        if hash_data.type == PathType.DUMP:
-            return self._find_missing_frames(self.dump.get(hash_data.hash))
-
-        if hash_data.type == PathType.SVG:
-            return self._find_missing_frames(self.svg.get(hash_data.data_hash))
-
-        return []
+        hash_id = hash_data.data_hash if hash_data.type == PathType.SVG else hash_data.hash
+        entry = self._index.get(hash_id)
+        if entry is None or entry[0] != hash_data.type:
+            return []
+        return entry[1].missing_frames
 
     def update(self, hash_data: NavGetCommData | SvgMessage) -> bool:
         """Update the map data."""
+        if hash_data.type not in PATH_TYPE_FIELDS:
+            return False
+
         if hash_data.type == PathType.AREA:
             existing_name = next((area for area in self.area_name if area.hash == hash_data.hash), None)
             if not existing_name:
                 name = f"area {len(self.area_name)+1}" if hash_data.area_label is None else hash_data.area_label.label
                 self.area_name.append(AreaHashNameList(name=name, hash=hash_data.hash))
-            return self._add_hash_data(self.area, hash_data)
-
-        if hash_data.type == PathType.OBSTACLE:
-            return self._add_hash_data(self.obstacle, hash_data)
-
-        if hash_data.type == PathType.PATH:
-            return self._add_hash_data(self.path, hash_data)
 
-        if hash_data.type == PathType.DUMP:
-            return self._add_hash_data(self.dump, hash_data)
-
-        if hash_data.type == PathType.SVG:
-            return self._add_hash_data(self.svg, hash_data)
-
-        return False
+        return self._add_hash_data(PathType(hash_data.type), hash_data)
 
     @staticmethod
     def _find_missing_frames(frame_list: FrameList | RootHashList) -> list[int]:
@@ -218,23 +407,21 @@ class HashList(DataClassORJSONMixin):
         missing_numbers = [num for num in number_list if num not in current_frames]
         return missing_numbers
 
-    @staticmethod
-    def _add_hash_data(hash_dict: dict, hash_data: NavGetCommData | SvgMessage) -> bool:
-        if isinstance(hash_data, SvgMessage):
-            if hash_dict.get(hash_data.data_hash) is None:
-                hash_dict[hash_data.data_hash] = FrameList(total_frame=hash_data.total_frame, data=[hash_data])
-                return True
-
-            if hash_data not in hash_dict[hash_data.data_hash].data:
-                hash_dict[hash_data.data_hash].data.append(hash_data)
-                return True
-            return False
-
-        if hash_dict.get(hash_data.hash) is None:
-            hash_dict[hash_data.hash] = FrameList(total_frame=hash_data.total_frame, data=[hash_data])
-            return True
-
-        if hash_data not in hash_dict[hash_data.hash].data:
-            hash_dict[hash_data.hash].data.append(hash_data)
-            return True
-        return False
+    def _add_hash_data(self, path_type: PathType, hash_data: NavGetCommData | SvgMessage) -> bool:
+        hash_id = hash_data.data_hash if isinstance(hash_data, SvgMessage) else hash_data.hash
+        entry = self._index.get(hash_id)
+        if entry is None:
+            frames = FrameList(total_frame=hash_data.total_frame, data=[hash_data])
+            getattr(self, PATH_TYPE_FIELDS[path_type])[hash_id] = frames
+            self._index[hash_id] = (path_type, frames)
+            self._missing.pop(hash_id, None)
+            added = True
+        else:
+            frames = entry[1]
+            added = frames.add(hash_data)
+
+        if frames.complete:
+            self._incomplete.discard(hash_id)
+        else:
+            self._incomplete.add(hash_id)
+        return added
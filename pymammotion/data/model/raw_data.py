@@ -1,215 +1,158 @@
-from dataclasses import dataclass, field
+"""Lazy mirror of the last protobuf sub message received for each oneof field."""
 
-from mashumaro.mixins.orjson import DataClassORJSONMixin
+from typing import Any
+
+import betterproto
 
 from pymammotion.proto import DevNet, LubaMsg, MctlDriver, MctlNav, MctlOta, MctlPept, MctlSys, SocMul
 
 
-@dataclass
 class RawMowerData:
-    raw: LubaMsg | None = field(default_factory=LubaMsg)
-
-    @classmethod
-    def from_raw(cls, raw: dict) -> "RawMowerData":
-        """Take in raw data to hold in the betterproto dataclass."""
-        return RawMowerData(raw=LubaMsg(**raw))
-
-    def update_raw(self, raw: dict) -> None:
-        """Update the raw LubaMsg data."""
-        self.raw = LubaMsg(**raw)
+    """Keep the last wire frame per oneof field and only decode it when read.
+
+    Frames are stored as received, keyed by LubaMsg group (``nav``, ``sys``...) and
+    sub message name. Betterproto objects are decoded on first access and memoised
+    until a newer frame for the same field arrives. Dicts are built fresh on every
+    call so callers can't modify the memoised values through them.
+    """
+
+    def __init__(self) -> None:
+        self._frames: dict[str, dict[str, bytes]] = {}
+        self._messages: dict[str, dict[str, Any]] = {}
+
+    def update(self, group: str, name: str, frame: bytes) -> None:
+        """Store the frame that carried ``group.name`` and drop the memoised value for it."""
+        self._frames.setdefault(group, {})[name] = frame
+        if messages := self._messages.get(group):
+            messages.pop(name, None)
+
+    def get(self, group: str, name: str) -> Any | None:
+        """Return the last received value of ``group.name`` or None if never received."""
+        messages = self._messages.setdefault(group, {})
+        if name in messages:
+            return messages[name]
+        frame = self._frames.get(group, {}).get(name)
+        if frame is None:
+            return None
+        value = getattr(getattr(LubaMsg().parse(frame), group), name)
+        messages[name] = value
+        return value
+
+    def get_dict(self, group: str) -> dict[str, Any]:
+        """Return the received fields of a group as snake case dicts."""
+        dicts = {}
+        for name in self._frames.get(group, {}):
+            value = self.get(group, name)
+            dicts[name] = (
+                value.to_dict(casing=betterproto.Casing.SNAKE) if isinstance(value, betterproto.Message) else value
+            )
+        return dicts
+
+    def to_dict(self) -> dict[str, dict[str, Any]]:
+        """Return all received fields in the LubaMsg layout, e.g. ``{"sys": {"toapp_report_data": {...}}}``."""
+        return {group: self.get_dict(group) for group in self._frames}
 
     @property
-    def net(self):
+    def net(self) -> "DevNetData":
         """Will return a wrapped betterproto of net."""
-        return DevNetData(net=self.raw.net)
+        return DevNetData(self)
 
     @property
-    def sys(self):
+    def sys(self) -> "SysData":
         """Will return a wrapped betterproto of sys."""
-        return SysData(sys=self.raw.sys)
+        return SysData(self)
 
     @property
-    def nav(self):
+    def nav(self) -> "NavData":
         """Will return a wrapped betterproto of nav."""
-        return NavData(nav=self.raw.nav)
+        return NavData(self)
 
     @property
-    def driver(self):
+    def driver(self) -> "DriverData":
         """Will return a wrapped betterproto of driver."""
-        return DriverData(driver=self.raw.driver)
+        return DriverData(self)
 
     @property
-    def mul(self):
+    def mul(self) -> "MulData":
         """Will return a wrapped betterproto of mul."""
-        return MulData(mul=self.raw.mul)
+        return MulData(self)
 
     @property
-    def ota(self):
+    def ota(self) -> "OtaData":
         """Will return a wrapped betterproto of ota."""
-        return OtaData(ota=self.raw.ota)
+        return OtaData(self)
 
     @property
-    def pept(self):
+    def pept(self) -> "PeptData":
         """Will return a wrapped betterproto of pept."""
-        return PeptData(pept=self.raw.pept)
-
-
-@dataclass
-class DevNetData(DataClassORJSONMixin):
-    """Wrapping class around LubaMsg to return a dataclass from the raw dict."""
-
-    net: dict
-
-    def __init__(self, net: DevNet) -> None:
-        if isinstance(net, dict):
-            self.net = net
-        else:
-            self.net = net.to_dict()
-
-    def __getattr__(self, item):
-        """Intercept call to get net in dict and return a betterproto dataclass."""
-        if self.net.get(item) is None:
-            return DevNet().__getattribute__(item)
-
-        if not isinstance(self.net.get(item), dict):
-            return self.net.get(item)
-
-        return DevNet().__getattribute__(item).from_dict(value=self.net.get(item))
-
-
-@dataclass
-class SysData(DataClassORJSONMixin):
-    """Wrapping class around LubaMsg to return a dataclass from the raw dict."""
-
-    sys: dict
-
-    def __init__(self, sys: MctlSys) -> None:
-        if isinstance(sys, dict):
-            self.sys = sys
-        else:
-            self.sys = sys.to_dict()
-
-    def __getattr__(self, item: str):
-        """Intercept call to get sys in dict and return a betterproto dataclass."""
-        if self.sys.get(item) is None:
-            return MctlSys().__getattribute__(item)
-
-        if not isinstance(self.sys.get(item), dict):
-            return self.sys.get(item)
-
-        return MctlSys().__getattribute__(item).from_dict(value=self.sys.get(item))
-
-
-@dataclass
-class NavData(DataClassORJSONMixin):
-    """Wrapping class around LubaMsg to return a dataclass from the raw dict."""
-
-    nav: dict
-
-    def __init__(self, nav: MctlNav) -> None:
-        if isinstance(nav, dict):
-            self.nav = nav
-        else:
-            self.nav = nav.to_dict()
-
-    def __getattr__(self, item: str):
-        """Intercept call to get nav in dict and return a betterproto dataclass."""
-        if self.nav.get(item) is None:
-            return MctlNav().__getattribute__(item)
-
-        if not isinstance(self.nav.get(item), dict):
-            return self.nav.get(item)
-
-        return MctlNav().__getattribute__(item).from_dict(value=self.nav.get(item))
-
+        return PeptData(self)
 
-@dataclass
-class DriverData(DataClassORJSONMixin):
-    """Wrapping class around LubaMsg to return a dataclass from the raw dict."""
 
-    driver: dict
+class RawGroupData:
+    """Wrapping class around one LubaMsg group that returns betterproto sub messages."""
 
-    def __init__(self, driver: MctlDriver) -> None:
-        if isinstance(driver, dict):
-            self.driver = driver
-        else:
-            self.driver = driver.to_dict()
+    group: str = ""
+    message_type: type[betterproto.Message] = betterproto.Message
 
-    def __getattr__(self, item: str):
-        """Intercept call to get driver in dict and return a betterproto dataclass."""
-        if self.driver.get(item) is None:
-            return MctlDriver().__getattribute__(item)
+    def __init__(self, raw: RawMowerData) -> None:
+        self._raw = raw
 
-        if not isinstance(self.driver.get(item), dict):
-            return self.driver.get(item)
+    def __getattr__(self, item: str) -> Any:
+        """Return the last received sub message, or the betterproto default if none was received."""
+        value = self._raw.get(self.group, item)
+        if value is None:
+            return getattr(self.message_type(), item)
+        return value
 
-        return MctlDriver().__getattribute__(item).from_dict(value=self.driver.get(item))
+    def to_dict(self) -> dict[str, Any]:
+        """Return the received sub messages as snake case dicts."""
+        return self._raw.get_dict(self.group)
 
 
-@dataclass
-class MulData(DataClassORJSONMixin):
-    """Wrapping class around LubaMsg to return a dataclass from the raw dict."""
+class DevNetData(RawGroupData):
+    """Wrapping class around the net group."""
 
-    mul: dict
+    group = "net"
+    message_type = DevNet
 
-    def __init__(self, mul: SocMul) -> None:
-        if isinstance(mul, dict):
-            self.mul = mul
-        else:
-            self.mul = mul.to_dict()
 
-    def __getattr__(self, item: str):
-        """Intercept call to get mul in dict and return a betterproto dataclass."""
-        if self.mul.get(item) is None:
-            return SocMul().__getattribute__(item)
+class SysData(RawGroupData):
+    """Wrapping class around the sys group."""
 
-        if not isinstance(self.mul.get(item), dict):
-            return self.mul.get(item)
+    group = "sys"
+    message_type = MctlSys
 
-        return SocMul().__getattribute__(item).from_dict(value=self.mul.get(item))
 
+class NavData(RawGroupData):
+    """Wrapping class around the nav group."""
 
-@dataclass
-class OtaData(DataClassORJSONMixin):
-    """Wrapping class around LubaMsg to return a dataclass from the raw dict."""
+    group = "nav"
+    message_type = MctlNav
 
-    ota: dict
 
-    def __init__(self, ota: MctlOta) -> None:
-        if isinstance(ota, dict):
-            self.ota = ota
-        else:
-            self.ota = ota.to_dict()
+class DriverData(RawGroupData):
+    """Wrapping class around the driver group."""
 
-    def __getattr__(self, item: str):
-        """Intercept call to get ota in dict and return a betterproto dataclass."""
-        if self.ota.get(item) is None:
-            return MctlOta().__getattribute__(item)
+    group = "driver"
+    message_type = MctlDriver
 
-        if not isinstance(self.ota.get(item), dict):
-            return self.ota.get(item)
 
-        return MctlOta().__getattribute__(item).from_dict(value=self.ota.get(item))
+class MulData(RawGroupData):
+    """Wrapping class around the mul group."""
 
+    group = "mul"
+    message_type = SocMul
 
-@dataclass
-class PeptData(DataClassORJSONMixin):
-    """Wrapping class around LubaMsg to return a dataclass from the raw dict."""
 
-    pept: dict
+class OtaData(RawGroupData):
+    """Wrapping class around the ota group."""
 
-    def __init__(self, pept: MctlPept) -> None:
-        if isinstance(pept, dict):
-            self.pept = pept
-        else:
-            self.pept = pept.to_dict()
+    group = "ota"
+    message_type = MctlOta
 
-    def __getattr__(self, item: str):
-        """Intercept call to get pept in dict and return a betterproto dataclass."""
-        if self.pept.get(item) is None:
-            return MctlPept().__getattribute__(item)
 
-        if not isinstance(self.pept.get(item), dict):
-            return self.pept.get(item)
+class PeptData(RawGroupData):
+    """Wrapping class around the pept group."""
 
-        return MctlPept().__getattribute__(item).from_dict(value=self.pept.get(item))
+    group = "pept"
+    message_type = MctlPept
@@ -12,6 +12,8 @@ from pymammotion.data.model.device_info import SideLight
 from pymammotion.data.model.hash_list import AreaHashNameList, NavGetCommData, NavGetHashListData, SvgMessage
 from pymammotion.data.mqtt.properties import ThingPropertiesMessage
 from pymammotion.data.mqtt.status import ThingStatusMessage
+from pymammotion.data.telemetry import TelemetryRecorder
+from pymammotion.event.state_bus import StateChangeBus, snapshot
 from pymammotion.proto import (
     AppGetAllAreaHashName,
     DeviceFwInfo,
@@ -51,6 +53,9 @@ class StateManager:
     def __init__(self, device: MowingDevice) -> None:
         self._device = device
         self.last_updated_at = datetime.now()
+        # fine grained change events, on_notification_callback still fires for every message
+        self.state_bus = StateChangeBus()
+        self.telemetry: TelemetryRecorder | None = None
 
     def get_device(self) -> MowingDevice:
         """Get device."""
@@ -60,6 +65,12 @@ class StateManager:
         """Set device."""
         self._device = device
 
+    def enable_telemetry(self, capacity: int = 86400) -> TelemetryRecorder:
+        """Start recording position, RTK, battery and work state on every report and rapid state update."""
+        if self.telemetry is None:
+            self.telemetry = TelemetryRecorder(capacity)
+        return self.telemetry
+
     def properties(self, thing_properties: ThingPropertiesMessage) -> None:
         # TODO update device based off thing properties
         self._device.mqtt_properties = thing_properties
@@ -104,6 +115,7 @@ class StateManager:
         # additional catch all if we don't get a status update
         if not self._device.online:
             self._device.online = True
+        before = snapshot(self._device, self.state_bus.sections(res[0]))
 
         match res[0]:
             case "nav":
@@ -119,6 +131,7 @@ class StateManager:
             case "ota":
                 self._update_ota_data(message)
 
+        self.state_bus.publish(before, self._device)
         await self.on_notification_callback(res)
 
     async def _update_nav_data(self, message) -> None:
@@ -133,9 +146,7 @@ class StateManager:
                 await self.gethash_ack_callback(nav_msg[1])
             case "toapp_get_commondata_ack":
                 common_data: NavGetCommDataAck = nav_msg[1]
-                updated = self._device.map.update(
-                    NavGetCommData.from_dict(common_data.to_dict(casing=betterproto.Casing.SNAKE))
-                )
+                updated = self._device.map.update(NavGetCommData.from_ack(common_data))
                 if updated:
                     await self.get_commondata_ack_callback(common_data)
             case "toapp_svg_msg":
@@ -159,10 +170,14 @@ class StateManager:
                 self._device.buffer(sys_msg[1])
             case "toapp_report_data":
                 self._device.update_report_data(sys_msg[1])
+                if self.telemetry is not None:
+                    self.telemetry.record(self._device)
             case "mow_to_app_info":
                 self._device.mow_info(sys_msg[1])
             case "system_tard_state_tunnel":
                 self._device.run_state_update(sys_msg[1])
+                if self.telemetry is not None:
+                    self.telemetry.record(self._device)
             case "todev_time_ctrl_light":
                 ctrl_light: TimeCtrlLight = sys_msg[1]
                 side_led: SideLight = SideLight.from_dict(ctrl_light.to_dict(casing=betterproto.Casing.SNAKE))
@@ -0,0 +1,148 @@
+"""Opt-in history of a mower's position, RTK, battery and work state in fixed size NumPy columns."""
+
+from pathlib import Path
+import time
+from typing import Any
+
+import numpy as np
+
+from pymammotion.data.model.device import MowingDevice
+from pymammotion.utility.conversions import parse_double
+
+# column name -> dtype, one row per recorded update
+COLUMNS: dict[str, np.dtype] = {
+    "time": np.dtype(np.float64),  # unix seconds
+    "latitude": np.dtype(np.float64),
+    "longitude": np.dtype(np.float64),
+    "pos_x": np.dtype(np.float32),  # ENU offset from the RTK base, scaled like run_state_update and map_position
+    "pos_y": np.dtype(np.float32),
+    "orientation": np.dtype(np.int16),
+    "position_type": np.dtype(np.uint8),
+    "rtk_status": np.dtype(np.uint8),
+    "satellites": np.dtype(np.uint16),
+    "battery": np.dtype(np.uint8),
+    "charge_state": np.dtype(np.uint8),
+    "work_state": np.dtype(np.uint16),
+    "work_zone": np.dtype(np.int64),
+}
+
+# bounds of the integer columns, the device reports int32/int64 and NumPy 2 raises on out of range values
+_LIMITS: dict[str, tuple[int, int]] = {
+    name: (int(np.iinfo(dtype).min), int(np.iinfo(dtype).max)) for name, dtype in COLUMNS.items() if dtype.kind in "iu"
+}
+
+
+def _clip(name: str, value: int) -> int:
+    low, high = _LIMITS[name]
+    return min(max(int(value), low), high)
+
+
+class TelemetryRecorder:
+    """Ring buffer of telemetry rows, the oldest rows are overwritten once ``capacity`` is reached.
+
+    Memory is allocated up front, about 50 bytes per row. Rows are expected in
+    time order, queries binary search the time column.
+    """
+
+    def __init__(self, capacity: int = 86400) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        # rows ever recorded and rows ever flushed, the next row goes to _total % capacity
+        self._total = 0
+        self._flushed = 0
+
+    def __len__(self) -> int:
+        return min(self._total, self.capacity)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self._columns.values())
+
+    def record(self, device: MowingDevice, timestamp: float | None = None) -> None:
+        """Append the device's current state."""
+        row = self._total % self.capacity
+        columns = self._columns
+        columns["time"][row] = time.time() if timestamp is None else timestamp
+        columns["latitude"][row] = device.location.device.latitude
+        columns["longitude"][row] = device.location.device.longitude
+        columns["pos_x"][row] = parse_double(device.mowing_state.pos_x, 4.0)
+        columns["pos_y"][row] = parse_double(device.mowing_state.pos_y, 4.0)
+        columns["orientation"][row] = _clip("orientation", device.location.orientation)
+        columns["position_type"][row] = _clip("position_type", device.location.position_type)
+        columns["rtk_status"][row] = _clip("rtk_status", device.mowing_state.rtk_status.value)
+        columns["satellites"][row] = _clip("satellites", device.mowing_state.satellites_total)
+        columns["battery"][row] = _clip("battery", device.report_data.dev.battery_val)
+        columns["charge_state"][row] = _clip("charge_state", device.report_data.dev.charge_state)
+        columns["work_state"][row] = _clip("work_state", device.report_data.dev.sys_status)
+        columns["work_zone"][row] = _clip("work_zone", device.location.work_zone)
+        self._total += 1
+
+    def clear(self) -> None:
+        self._total = self._flushed = 0
+
+    def _rows(self, last: int) -> dict[str, np.ndarray]:
+        """Copy the last ``last`` rows, oldest first."""
+        last = min(last, len(self))
+        end = self._total % self.capacity
+        start = end - last
+        if start >= 0:
+            return {name: column[start:end].copy() for name, column in self._columns.items()}
+        return {name: np.concatenate((column[start:], column[:end])) for name, column in self._columns.items()}
+
+    def query(self, start: float | None = None, end: float | None = None) -> dict[str, np.ndarray]:
+        """Return the rows with start <= time < end as columns, oldest first."""
+        rows = self._rows(len(self))
+        times = rows["time"]
+        lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        hi = len(times) if end is None else int(np.searchsorted(times, end, side="left"))
+        return {name: column[lo:hi] for name, column in rows.items()}
+
+    def to_arrow(self, start: float | None = None, end: float | None = None) -> Any:
+        """Return the rows in the time range as a pyarrow Table."""
+        return _pyarrow().table(self.query(start, end))
+
+    def flush(self, path: str | Path, file_format: str = "parquet", compression: str = "zstd") -> int:
+        """Write the rows recorded since the last flush to a new Parquet or Arrow IPC file.
+
+        Every flush only holds the rows since the previous one, so each needs a
+        path of its own, e.g. with a timestamp in the name. Raises FileExistsError
+        rather than overwrite an earlier batch.
+
+        Returns the number of rows written. Rows that were overwritten before
+        being flushed are lost, flush at least every ``capacity`` rows to keep them all.
+        """
+        if file_format not in ("parquet", "arrow"):
+            raise ValueError(f"Unknown file format: {file_format}")
+        pa = _pyarrow()
+        pending = min(self._total - self._flushed, len(self))
+        table = pa.table(self._rows(pending))
+        # "x" fails instead of truncating an existing file
+        with open(path, "xb") as sink:
+            try:
+                if file_format == "parquet":
+                    import pyarrow.parquet as pq
+
+                    pq.write_table(table, sink, compression=compression)
+                else:
+                    import pyarrow.ipc as ipc
+
+                    options = ipc.IpcWriteOptions(compression=compression)
+                    with ipc.new_file(sink, table.schema, options=options) as writer:
+                        writer.write_table(table)
+            except BaseException:
+                sink.close()
+                Path(path).unlink()
+                raise
+        self._flushed = self._total
+        return pending
+
+
+def _pyarrow() -> Any:
+    """Import pyarrow, only needed to export."""
+    try:
+        import pyarrow
+    except ImportError as err:
+        raise ImportError("Exporting telemetry needs pyarrow, install it with pip install pyarrow") from err
+    return pyarrow
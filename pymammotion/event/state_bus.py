@@ -0,0 +1,181 @@
+"""Publish what changed in a MowingDevice to subscribers, coalesced and rate limited per subscriber."""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Collection
+from dataclasses import dataclass, field, fields
+import logging
+import time
+from typing import Any
+
+from pymammotion.data.model.device import MowingDevice
+from pymammotion.data.model.hash_list import FrameList
+
+_LOGGER = logging.getLogger(__name__)
+
+SECTIONS = ("report_data", "location", "mowing_state", "mower_state", "map")
+
+# sections each LubaMsg sub message can change
+MESSAGE_SECTIONS: dict[str, tuple[str, ...]] = {
+    "nav": ("map",),
+    "sys": ("report_data", "location", "mowing_state", "mower_state"),
+    "net": ("mower_state",),
+}
+
+
+@dataclass
+class StateChange:
+    """Fields of one MowingDevice section that changed, with their new values.
+
+    The values are the device's own objects, not copies, copy them before mutating.
+    """
+
+    section: str
+    changes: dict[str, Any]
+
+
+StateChangeCallback = Callable[[list[StateChange]], Awaitable[None]]
+
+
+def _fingerprint(value: Any) -> Any:
+    """Return a plain copy of a value that compares equal as long as the value is unchanged."""
+    if isinstance(value, dict):
+        # map data, the FrameList version changes whenever frames are added
+        return {key: item.version if isinstance(item, FrameList) else _fingerprint(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fingerprint(item) for item in value]
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return value
+
+
+def snapshot(device: MowingDevice, sections: Collection[str]) -> dict[str, dict[str, Any]]:
+    """Return the fingerprint of every field of the given sections."""
+    result = {}
+    for section in sections:
+        value = getattr(device, section)
+        result[section] = {f.name: _fingerprint(getattr(value, f.name)) for f in fields(value)}
+    return result
+
+
+def diff(before: dict[str, dict[str, Any]], device: MowingDevice) -> list[StateChange]:
+    """Return the fields of each snapshotted section whose fingerprint changed, with their current values."""
+    changes = []
+    for section, old in before.items():
+        value = getattr(device, section)
+        changed = {}
+        for f in fields(value):
+            new = getattr(value, f.name)
+            if _fingerprint(new) != old.get(f.name):
+                changed[f.name] = new
+        if changed:
+            changes.append(StateChange(section, changed))
+    return changes
+
+
+@dataclass(eq=False)
+class _Subscriber:
+    callback: StateChangeCallback
+    sections: frozenset[str]
+    coalesce: float
+    min_interval: float
+    pending: dict[str, dict[str, Any]] = field(default_factory=dict)
+    first_pending: float = 0.0
+    last_delivery: float = float("-inf")
+    timer: asyncio.TimerHandle | None = None
+    task: asyncio.Task | None = None
+
+
+class StateChangeBus:
+    """Diff MowingDevice sections around each update and tell subscribers what changed.
+
+    A subscriber gets a list of StateChange, one per changed section it asked
+    for. With ``coalesce`` set, changes are collected for that many seconds
+    after the first one and delivered together, newer values replacing older
+    ones. ``min_interval`` is the least time between two deliveries, changes
+    in between are merged into the next one. Subscribers with neither get
+    changes as soon as the update is done. Callbacks always run in a task of
+    their own so a slow subscriber never holds up the update, changes that
+    come in while one runs are merged into its next delivery.
+    """
+
+    def __init__(self) -> None:
+        self._subscribers: list[_Subscriber] = []
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def sections(self, message: str) -> tuple[str, ...]:
+        """Return the sections to snapshot for a message, none when nobody is listening."""
+        return MESSAGE_SECTIONS.get(message, ()) if self._subscribers else ()
+
+    def subscribe(
+        self,
+        callback: StateChangeCallback,
+        sections: Collection[str] = SECTIONS,
+        coalesce: float = 0.0,
+        min_interval: float = 0.0,
+    ) -> Callable[[], None]:
+        """Subscribe to changes of the given sections, returns a function that unsubscribes."""
+        unknown = set(sections) - set(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))}")
+        subscriber = _Subscriber(callback, frozenset(sections), coalesce, min_interval)
+        self._subscribers.append(subscriber)
+
+        def unsubscribe() -> None:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+            if subscriber.timer is not None:
+                subscriber.timer.cancel()
+
+        return unsubscribe
+
+    def publish(self, before: dict[str, dict[str, Any]], device: MowingDevice) -> None:
+        """Diff the device against a snapshot taken before it was updated and notify subscribers."""
+        if not before:
+            return
+        changes = diff(before, device)
+        if not changes:
+            return
+        for subscriber in list(self._subscribers):
+            relevant = [change for change in changes if change.section in subscriber.sections]
+            if relevant:
+                self._queue(subscriber, relevant)
+
+    def _queue(self, subscriber: _Subscriber, changes: list[StateChange]) -> None:
+        if not subscriber.pending:
+            subscriber.first_pending = time.monotonic()
+        for change in changes:
+            subscriber.pending.setdefault(change.section, {}).update(change.changes)
+        if subscriber.timer is None and subscriber.task is None:
+            self._schedule(subscriber)
+
+    def _schedule(self, subscriber: _Subscriber) -> None:
+        due = max(subscriber.first_pending + subscriber.coalesce, subscriber.last_delivery + subscriber.min_interval)
+        delay = due - time.monotonic()
+        if delay <= 0:
+            self._flush(subscriber)
+        else:
+            subscriber.timer = asyncio.get_running_loop().call_later(delay, self._flush, subscriber)
+
+    def _flush(self, subscriber: _Subscriber) -> None:
+        subscriber.timer = None
+        changes = [StateChange(section, values) for section, values in subscriber.pending.items()]
+        subscriber.pending = {}
+        subscriber.task = asyncio.get_running_loop().create_task(self._deliver_queued(subscriber, changes))
+
+    async def _deliver_queued(self, subscriber: _Subscriber, changes: list[StateChange]) -> None:
+        await self._deliver(subscriber, changes)
+        subscriber.task = None
+        # changes that came in while the callback ran
+        if subscriber.pending and subscriber in self._subscribers:
+            self._schedule(subscriber)
+
+    @staticmethod
+    async def _deliver(subscriber: _Subscriber, changes: list[StateChange]) -> None:
+        subscriber.last_delivery = time.monotonic()
+        try:
+            await subscriber.callback(changes)
+        except Exception:
+            _LOGGER.exception("Error in state change subscriber %s", subscriber.callback)
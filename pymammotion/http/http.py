@@ -18,6 +18,11 @@ class MammotionHTTP:
         self._headers = {"User-Agent": "okhttp/3.14.9", "App-Version": "google Pixel 2 XL taimen-Android 11,1.11.332"}
         self.encryption_utils = EncryptionUtils()
 
+    def set_login_info(self, login_info: LoginResponseData) -> None:
+        """Use an existing login, e.g. restored from a cached session."""
+        self.login_info = login_info
+        self._headers["Authorization"] = f"Bearer {login_info.access_token}"
+
     @staticmethod
     def generate_headers(token: str) -> dict:
         return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,189 @@
+"""Match device responses to the commands that requested them."""
+
+from collections import OrderedDict
+import logging
+import uuid
+
+import betterproto
+
+from pymammotion.mqtt.mammotion_future import MammotionFuture
+from pymammotion.proto import LubaMsg
+
+_LOGGER = logging.getLogger(__name__)
+
+# LubaMsg group -> name of the oneof inside that group's sub message
+SUB_MSG_GROUPS = {
+    "nav": "SubNavMsg",
+    "sys": "SubSysMsg",
+    "driver": "SubDrvMsg",
+    "net": "NetSubType",
+    "mul": "SubMul",
+    "ota": "SubOtaMsg",
+}
+
+# (group, request sub message) -> sub messages the device answers with
+EXPECTED_RESPONSES: dict[tuple[str, str], tuple[str, ...]] = {
+    ("nav", "todev_gethash"): ("toapp_gethash_ack",),
+    ("nav", "todev_get_commondata"): ("toapp_get_commondata_ack", "toapp_svg_msg"),
+    ("nav", "todev_svg_msg"): ("toapp_svg_msg",),
+    ("nav", "toapp_map_name_msg"): ("toapp_all_hash_name", "toapp_map_name_msg"),
+    ("nav", "todev_taskctrl"): ("todev_taskctrl_ack",),
+    ("nav", "todev_work_report_cmd"): ("toapp_work_report_ack",),
+    ("nav", "todev_work_report_update_cmd"): ("toapp_work_report_update_ack",),
+    ("nav", "todev_zigzag_ack"): ("toapp_zigzag",),
+    ("nav", "bidire_reqconver_path"): ("bidire_reqconver_path",),
+    ("nav", "nav_sys_param_cmd"): ("nav_sys_param_cmd",),
+    ("sys", "bidire_comm_cmd"): ("bidire_comm_cmd", "system_update_buf"),
+    ("sys", "todev_time_ctrl_light"): ("todev_time_ctrl_light",),
+    ("sys", "todev_get_dev_fw_info"): ("toapp_dev_fw_info",),
+    ("sys", "todev_lora_cfg_req"): ("toapp_lora_cfg_rsp",),
+    ("sys", "todev_report_cfg"): ("toapp_report_data",),
+    ("sys", "device_product_type_info"): ("device_product_type_info",),
+    ("net", "todev_devinfo_req"): ("toapp_devinfo_resp",),
+    ("net", "todev_networkinfo_req"): ("toapp_networkinfo_rsp",),
+    ("net", "todev_mnet_info_req"): ("toapp_mnet_info_rsp",),
+    ("net", "todev_get_mnet_cfg_req"): ("toapp_get_mnet_cfg_rsp",),
+    ("net", "todev_set_mnet_cfg_req"): ("toapp_set_mnet_cfg_rsp",),
+    ("net", "todev_wifi_list_upload"): ("toapp_list_upload",),
+    ("net", "todev_wifi_msg_upload"): ("toapp_wifi_msg",),
+    ("net", "todev_wifi_configuration"): ("toapp_wifi_conf",),
+    ("net", "todev_uploadfile_req"): ("toapp_uploadfile_rsp",),
+    ("driver", "bidire_speed_read_set"): ("bidire_speed_read_set",),
+    ("driver", "rtk_cfg_req"): ("rtk_cfg_req_ack",),
+    ("driver", "rtk_sys_mask_query"): ("rtk_sys_mask_query_ack",),
+    ("ota", "todev_get_info_req"): ("toapp_get_info_rsp",),
+    ("mul", "set_video"): ("set_video_ack",),
+    ("mul", "set_wiper"): ("set_wiper_ack",),
+}
+
+# read only queries, the only commands that are sent without waiting for the previous response
+PIPELINE_COMMANDS = frozenset(
+    {
+        ("nav", "todev_gethash"),
+        ("nav", "todev_get_commondata"),
+        ("sys", "todev_get_dev_fw_info"),
+        ("sys", "device_product_type_info"),
+        ("net", "todev_devinfo_req"),
+        ("net", "todev_networkinfo_req"),
+        ("net", "todev_mnet_info_req"),
+        ("net", "todev_get_mnet_cfg_req"),
+        ("driver", "rtk_sys_mask_query"),
+        ("ota", "todev_get_info_req"),
+    }
+)
+
+# periodic reports the device pushes on its own, these only answer commands that explicitly expect them
+UNSOLICITED_MESSAGES = frozenset(
+    {
+        ("sys", "toapp_report_data"),
+        ("sys", "system_tard_state_tunnel"),
+        ("sys", "system_rapid_state_tunnel"),
+        ("sys", "system_tmp_cycle_tx"),
+        ("sys", "toapp_batinfo"),
+        ("sys", "toapp_work_state"),
+        ("sys", "mow_to_app_info"),
+        ("nav", "toapp_pos_up"),
+        ("net", "todev_ble_sync"),
+        ("net", "toapp_wifi_iot_status"),
+    }
+)
+
+# matches any response in a group for commands without an entry in EXPECTED_RESPONSES
+ANY_RESPONSE = ""
+
+
+def sub_message_name(msg: LubaMsg) -> tuple[str, str]:
+    """Return (group, sub message name) of a LubaMsg, e.g. ("sys", "toapp_report_data")."""
+    group, group_msg = betterproto.which_one_of(msg, "LubaSubMsg")
+    oneof = SUB_MSG_GROUPS.get(group)
+    if oneof is None or group_msg is None:
+        return group, ""
+    return group, betterproto.which_one_of(group_msg, oneof)[0]
+
+
+def response_keys(command: bytes) -> list[tuple[str, str]]:
+    """Return the (group, sub message) pairs that answer a serialised command."""
+    try:
+        group, name = sub_message_name(LubaMsg().parse(command))
+    except (KeyError, ValueError, IndexError, UnicodeDecodeError):
+        _LOGGER.debug("Unable to parse command for response matching")
+        return []
+    if not group:
+        return []
+    if expected := EXPECTED_RESPONSES.get((group, name)):
+        return [(group, response) for response in expected]
+    return [(group, ANY_RESPONSE)]
+
+
+def can_pipeline(command: bytes) -> bool:
+    """Return True if ``command`` is a read that may be in flight alongside other commands.
+
+    Only the queries in PIPELINE_COMMANDS qualify, they change nothing on the
+    device and their responses can't be mistaken for another command's.
+    Everything else, control commands in particular, keeps its order.
+    """
+    try:
+        return sub_message_name(LubaMsg().parse(command)) in PIPELINE_COMMANDS
+    except (KeyError, ValueError, IndexError, UnicodeDecodeError):
+        return False
+
+
+class ResponseMatcher:
+    """Pending command futures keyed by (iot_id, group, expected sub message).
+
+    Each key holds its futures in send order so lookups and removals are O(1).
+    A future is evicted from every key it was registered under as soon as it is
+    resolved, times out or is cancelled, so stale entries never accumulate.
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[tuple[str, str, str], OrderedDict[str, MammotionFuture]] = {}
+        self._keys_by_request: dict[str, list[tuple[str, str, str]]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of commands waiting for a response."""
+        return len(self._keys_by_request)
+
+    def register(self, iot_id: str, command: bytes) -> MammotionFuture:
+        """Create a future that resolves with the response to ``command``."""
+        request_id = str(uuid.uuid4())
+        future = MammotionFuture(iot_id, request_id)
+        keys = [(iot_id, group, name) for group, name in response_keys(command)]
+        for key in keys:
+            self._pending.setdefault(key, OrderedDict())[request_id] = future
+        self._keys_by_request[request_id] = keys
+        future.fut.add_done_callback(lambda _: self._evict(request_id))
+        return future
+
+    def resolve(self, iot_id: str, msg: LubaMsg, data: bytes) -> bool:
+        """Resolve the oldest command waiting for this response, returns False if none was waiting."""
+        group, name = sub_message_name(msg)
+        keys = [(iot_id, group, name)]
+        if (group, name) not in UNSOLICITED_MESSAGES:
+            keys.append((iot_id, group, ANY_RESPONSE))
+        for key in keys:
+            pending = self._pending.get(key)
+            while pending:
+                request_id, future = pending.popitem(last=False)
+                self._evict(request_id)
+                if not future.fut.done():
+                    future.resolve(data)
+                    return True
+        return False
+
+    def is_awaited(self, iot_id: str, msg: LubaMsg) -> bool:
+        """Return True if a command is waiting for this message, same keys as resolve."""
+        group, name = sub_message_name(msg)
+        if (iot_id, group, name) in self._pending:
+            return True
+        return (group, name) not in UNSOLICITED_MESSAGES and (iot_id, group, ANY_RESPONSE) in self._pending
+
+    def _evict(self, request_id: str) -> None:
+        """Remove a request from every key it was registered under."""
+        for key in self._keys_by_request.pop(request_id, []):
+            pending = self._pending.get(key)
+            if pending is None:
+                continue
+            pending.pop(request_id, None)
+            if not pending:
+                del self._pending[key]
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import asyncio
+from collections.abc import Awaitable
 from enum import Enum
 import logging
 from typing import Any
@@ -10,20 +11,36 @@ from typing import Any
 from bleak.backends.device import BLEDevice
 
 from pymammotion.aliyun.cloud_gateway import CloudIOTGateway
+from pymammotion.aliyun.model.cached_session import CACHED_SESSION_VERSION, CachedSession
 from pymammotion.aliyun.model.dev_by_account_response import Device
+from pymammotion.bluetooth.connection_manager import BleConnectionManager
 from pymammotion.data.model.account import Credentials
 from pymammotion.data.model.device import MowingDevice
 from pymammotion.data.state_manager import StateManager
+from pymammotion.data.telemetry import TelemetryRecorder
 from pymammotion.http.http import MammotionHTTP
 from pymammotion.mammotion.devices.mammotion_bluetooth import MammotionBaseBLEDevice
 from pymammotion.mammotion.devices.mammotion_cloud import MammotionBaseCloudDevice, MammotionCloud
-from pymammotion.mqtt import MammotionMQTT
+from pymammotion.mqtt import MammotionAsyncMQTT, MammotionMQTT
+from pymammotion.utility.store import Store
 
 TIMEOUT_CLOUD_RESPONSE = 10
 
 _LOGGER = logging.getLogger(__name__)
 
 
+async def _gather(*coros: Awaitable[Any]) -> list[Any]:
+    """Like asyncio.gather, but cancel the others as soon as one fails instead of leaving them running."""
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
 class ConnectionPreference(Enum):
     """Enum for connection preference."""
 
@@ -44,8 +61,12 @@ class MammotionMixedDeviceManager:
         ble_device: BLEDevice | None = None,
         mqtt: MammotionCloud | None = None,
         preference: ConnectionPreference = ConnectionPreference.BLUETOOTH,
+        map_store: Store | None = None,
+        ble_connection_manager: BleConnectionManager | None = None,
     ) -> None:
         self.name = name
+        self._map_store = map_store
+        self._ble_connection_manager = ble_connection_manager
         self._state_manager = StateManager(MowingDevice())
         self._state_manager.get_device().name = name
         self.add_ble(ble_device)
@@ -60,6 +81,14 @@ class MammotionMixedDeviceManager:
     def mower_state(self, value: MowingDevice) -> None:
         self._state_manager.set_device(value)
 
+    @property
+    def telemetry(self) -> TelemetryRecorder | None:
+        return self._state_manager.telemetry
+
+    def enable_telemetry(self, capacity: int = 86400) -> TelemetryRecorder:
+        """Keep a history of the mower's position, RTK, battery and work state."""
+        return self._state_manager.enable_telemetry(capacity)
+
     def ble(self) -> MammotionBaseBLEDevice | None:
         return self._ble_device
 
@@ -68,18 +97,23 @@ class MammotionMixedDeviceManager:
 
     def has_queued_commands(self) -> bool:
         if self.has_cloud() and self.preference == ConnectionPreference.WIFI:
-            return not self.cloud().mqtt.command_queue.empty()
+            return self.cloud().mqtt.has_queued_commands(self.cloud().iot_id)
         else:
             return not self.ble().command_queue.empty()
 
     def add_ble(self, ble_device: BLEDevice) -> None:
         if ble_device is not None:
-            self._ble_device = MammotionBaseBLEDevice(state_manager=self._state_manager, device=ble_device)
+            self._ble_device = MammotionBaseBLEDevice(
+                state_manager=self._state_manager,
+                device=ble_device,
+                connection_manager=self._ble_connection_manager,
+                map_store=self._map_store,
+            )
 
     def add_cloud(self, cloud_device: Device | None = None, mqtt: MammotionCloud | None = None) -> None:
         if cloud_device is not None:
             self._cloud_device = MammotionBaseCloudDevice(
-                mqtt, cloud_device=cloud_device, state_manager=self._state_manager
+                mqtt, cloud_device=cloud_device, state_manager=self._state_manager, map_store=self._map_store
             )
 
     def replace_cloud(self, cloud_device: MammotionBaseCloudDevice) -> None:
@@ -96,7 +130,9 @@ class MammotionMixedDeviceManager:
 
     def replace_mqtt(self, mqtt: MammotionCloud) -> None:
         device = self._cloud_device.device
-        self._cloud_device = MammotionBaseCloudDevice(mqtt, cloud_device=device, state_manager=self._state_manager)
+        self._cloud_device = MammotionBaseCloudDevice(
+            mqtt, cloud_device=device, state_manager=self._state_manager, map_store=self._map_store
+        )
 
     def has_cloud(self) -> bool:
         return self._cloud_device is not None
@@ -123,15 +159,16 @@ class MammotionDeviceManager:
 
     async def remove_device(self, name: str) -> None:
         device_for_removal = self.devices.pop(name)
-        loop = asyncio.get_running_loop()
         if device_for_removal.has_cloud():
             should_disconnect = {
                 device
                 for key, device in self.devices.items()
                 if device.cloud() is not None and device.cloud().mqtt == device_for_removal.cloud().mqtt
             }
+            device_for_removal.cloud().mqtt.unregister_device(device_for_removal.cloud())
             if len(should_disconnect) == 0:
-                await loop.run_in_executor(None, device_for_removal.cloud().mqtt.disconnect)
+                await device_for_removal.cloud().mqtt.async_disconnect()
+                await device_for_removal.cloud().mqtt.cloud_client.close()
             await device_for_removal.cloud().stop()
         if device_for_removal.has_ble():
             await device_for_removal.ble().stop()
@@ -168,33 +205,84 @@ class Mammotion:
             cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self) -> None:
-        """Initialize MammotionDevice."""
-        self._login_lock = asyncio.Lock()
+    def __init__(
+        self,
+        session_store: Store | None = None,
+        map_store: Store | None = None,
+        ble_connection_manager: BleConnectionManager | None = None,
+        mqtt_transport: type[MammotionMQTT] | type[MammotionAsyncMQTT] | None = None,
+    ) -> None:
+        """Initialize MammotionDevice.
+
+        Pass a session_store (e.g. JsonFileStore) to reuse cloud sessions across restarts,
+        a map_store to only download the map data that changed since the last sync
+        and a ble_connection_manager to spread mowers over several adapters.
+        Pass mqtt_transport=MammotionAsyncMQTT to run MQTT on the event loop instead of the LinkKit threads.
+        """
+        if not hasattr(self, "_login_locks"):
+            # Mammotion is a singleton, a later Mammotion() call must not reset what the first one was given
+            # one lock per account so accounts can log in side by side
+            self._login_locks: dict[str, asyncio.Lock] = {}
+            self.session_store: Store | None = None
+            self.map_store: Store | None = None
+            self.ble_connection_manager: BleConnectionManager | None = None
+            self.mqtt_transport: type[MammotionMQTT] | type[MammotionAsyncMQTT] = MammotionMQTT
+        if session_store is not None:
+            self.session_store = session_store
+        if map_store is not None:
+            self.map_store = map_store
+        if ble_connection_manager is not None:
+            self.ble_connection_manager = ble_connection_manager
+        if mqtt_transport is not None:
+            self.mqtt_transport = mqtt_transport
 
     def add_ble_device(
         self, ble_device: BLEDevice, preference: ConnectionPreference = ConnectionPreference.BLUETOOTH
     ) -> None:
         if ble_device:
             self.device_manager.add_device(
-                MammotionMixedDeviceManager(name=ble_device.name, ble_device=ble_device, preference=preference)
+                MammotionMixedDeviceManager(
+                    name=ble_device.name,
+                    ble_device=ble_device,
+                    preference=preference,
+                    map_store=self.map_store,
+                    ble_connection_manager=self.ble_connection_manager,
+                )
             )
 
     async def login_and_initiate_cloud(self, account, password, force: bool = False) -> None:
-        async with self._login_lock:
+        async with self._login_locks.setdefault(account, asyncio.Lock()):
             exists: MammotionCloud | None = self.mqtt_list.get(account)
             if not exists or force:
                 cloud_client = await self.login(account, password)
                 await self.initiate_cloud_connection(account, cloud_client)
 
+    async def login_and_initiate_cloud_accounts(
+        self, credentials: list[Credentials], force: bool = False
+    ) -> list[BaseException | None]:
+        """Log in to several accounts concurrently.
+
+        Returns one entry per credential, None on success or the exception that account failed with.
+        """
+        results = await asyncio.gather(
+            *(
+                self.login_and_initiate_cloud(credential.account_id or credential.email, credential.password, force)
+                for credential in credentials
+            ),
+            return_exceptions=True,
+        )
+        for credential, result in zip(credentials, results):
+            if isinstance(result, BaseException):
+                _LOGGER.error("Login failed for %s: %s", credential.account_id or credential.email, result)
+        return list(results)
+
     async def initiate_cloud_connection(self, account: str, cloud_client: CloudIOTGateway) -> None:
-        loop = asyncio.get_running_loop()
         if mqtt := self.mqtt_list.get(account):
             if mqtt.is_connected():
-                await loop.run_in_executor(None, mqtt.disconnect)
+                await mqtt.async_disconnect()
 
         mammotion_cloud = MammotionCloud(
-            MammotionMQTT(
+            self.mqtt_transport(
                 region_id=cloud_client.region_response.data.regionId,
                 product_key=cloud_client.aep_response.data.productKey,
                 device_name=cloud_client.aep_response.data.deviceName,
@@ -208,7 +296,7 @@ class Mammotion:
         self.mqtt_list[account] = mammotion_cloud
         self.add_cloud_devices(mammotion_cloud)
 
-        await loop.run_in_executor(None, self.mqtt_list[account].connect_async)
+        await self.mqtt_list[account].async_connect()
 
     def add_cloud_devices(self, mqtt_client: MammotionCloud) -> None:
         for device in mqtt_client.cloud_client.devices_by_account_response.data.data:
@@ -219,6 +307,8 @@ class Mammotion:
                     cloud_device=device,
                     mqtt=mqtt_client,
                     preference=ConnectionPreference.WIFI,
+                    map_store=self.map_store,
+                    ble_connection_manager=self.ble_connection_manager,
                 )
                 mixed_device.mower_state.mower_state.product_key = device.productKey
                 mixed_device.mower_state.mower_state.model = (
@@ -238,24 +328,80 @@ class Mammotion:
                 ble_device.set_disconnect_strategy(disconnect)
 
     async def login(self, account: str, password: str) -> CloudIOTGateway:
-        """Login to mammotion cloud."""
+        """Login to mammotion cloud, reusing the cached session when it is still valid."""
+        if cloud_client := await self._restore_session(account):
+            return cloud_client
+        cloud_client = await self._login(account, password)
+        await self._save_session(account, cloud_client)
+        return cloud_client
+
+    async def _restore_session(self, account: str) -> CloudIOTGateway | None:
+        """Rebuild the cloud client from the session store, returns None if a full login is needed."""
+        if self.session_store is None:
+            return None
+        data = await self.session_store.load(account)
+        if data is None:
+            return None
+        cloud_client: CloudIOTGateway | None = None
+        try:
+            cached = CachedSession.from_dict(data)
+            if cached.version != CACHED_SESSION_VERSION:
+                raise ValueError(f"cache version {cached.version}")
+            cloud_client = CloudIOTGateway.from_cached_session(cached)
+            # refreshes the iot token if it expired while we were down, raises if the refresh token did too
+            await cloud_client.token_manager.ensure_valid()
+            # proves the token is accepted and picks up devices bound since the cache was written
+            await cloud_client.async_list_binding_by_account()
+        except Exception as ex:
+            _LOGGER.debug("Cached session for %s is no longer valid: %s", account, ex)
+            if cloud_client is not None:
+                await cloud_client.close()
+            await self.session_store.remove(account)
+            return None
+        _LOGGER.debug("Restored cached session for %s", account)
+        await self._save_session(account, cloud_client)
+        return cloud_client
+
+    async def _save_session(self, account: str, cloud_client: CloudIOTGateway) -> None:
+        """Write the session to the store and keep it current when the token is refreshed."""
+        if self.session_store is None:
+            return
+
+        async def save() -> None:
+            await self.session_store.save(account, cloud_client.to_cached_session().to_dict())
+
+        cloud_client.token_manager.on_refreshed = save
+        await save()
+
+    async def _login(self, account: str, password: str) -> CloudIOTGateway:
+        """Run the full login chain."""
         cloud_client = CloudIOTGateway()
         mammotion_http = MammotionHTTP()
-        await mammotion_http.login(account, password)
-        country_code = mammotion_http.login_info.userInformation.domainAbbreviation
-        _LOGGER.debug("CountryCode: " + country_code)
-        _LOGGER.debug("AuthCode: " + mammotion_http.login_info.authorization_code)
-        cloud_client.set_http(mammotion_http)
-        loop = asyncio.get_running_loop()
-        await loop.run_in_executor(
-            None, cloud_client.get_region, country_code, mammotion_http.login_info.authorization_code
-        )
-        await cloud_client.connect()
-        await cloud_client.login_by_oauth(country_code, mammotion_http.login_info.authorization_code)
-        await loop.run_in_executor(None, cloud_client.aep_handle)
-        await loop.run_in_executor(None, cloud_client.session_by_auth_code)
 
-        await loop.run_in_executor(None, cloud_client.list_binding_by_account)
+        async def get_region() -> str:
+            await mammotion_http.login(account, password)
+            country_code = mammotion_http.login_info.userInformation.domainAbbreviation
+            _LOGGER.debug("CountryCode: " + country_code)
+            _LOGGER.debug("AuthCode: " + mammotion_http.login_info.authorization_code)
+            cloud_client.set_http(mammotion_http)
+            await cloud_client.async_get_region(country_code, mammotion_http.login_info.authorization_code)
+            return country_code
+
+        try:
+            # the open account connect only depends on the app key, so it runs alongside the account login
+            country_code, _ = await _gather(get_region(), cloud_client.connect())
+            # both only need the region, the session needs the oauth result
+            await _gather(
+                cloud_client.login_by_oauth(country_code, mammotion_http.login_info.authorization_code),
+                cloud_client.async_aep_handle(),
+            )
+            await cloud_client.async_session_by_auth_code()
+
+            await cloud_client.async_list_binding_by_account()
+        except BaseException:
+            # drops the pooled connections and any refresh the session step already scheduled
+            await cloud_client.close()
+            raise
         return cloud_client
 
     async def remove_device(self, name: str) -> None:
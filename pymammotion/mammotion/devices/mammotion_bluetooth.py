@@ -1,5 +1,6 @@
 import asyncio
 from collections.abc import Awaitable, Callable
+from contextlib import AbstractAsyncContextManager, nullcontext
 import logging
 from typing import Any, cast
 from uuid import UUID
@@ -15,15 +16,21 @@ from bleak_retry_connector import (
 )
 
 from pymammotion.bluetooth import BleMessage
+from pymammotion.bluetooth.connection_manager import BleConnectionManager
 from pymammotion.data.state_manager import StateManager
 from pymammotion.mammotion.commands.mammotion_command import MammotionCommand
+from pymammotion.mammotion.commands.response_matcher import ResponseMatcher, can_pipeline
 from pymammotion.mammotion.devices.base import MammotionBaseDevice
 from pymammotion.proto import LubaMsg, has_field
+from pymammotion.utility.store import Store
 
 DBUS_ERROR_BACKOFF_TIME = 0.25
 
 DISCONNECT_DELAY = 10
 
+# commands with a distinct expected response that may wait for their responses at the same time
+MAX_IN_FLIGHT = 4
+
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -54,12 +61,6 @@ READ_CHAR_UUID = _sb_uuid(comms_type="rx")
 WRITE_CHAR_UUID = _sb_uuid(comms_type="tx")
 
 
-def _handle_timeout(fut: asyncio.Future[None]) -> None:
-    """Handle a timeout."""
-    if not fut.done():
-        fut.set_exception(asyncio.TimeoutError)
-
-
 async def _handle_retry(fut: asyncio.Future[None], func, command: bytes) -> None:
     """Handle a retry."""
     if not fut.done():
@@ -69,9 +70,19 @@ async def _handle_retry(fut: asyncio.Future[None], func, command: bytes) -> None
 class MammotionBaseBLEDevice(MammotionBaseDevice):
     """Base class for Mammotion BLE devices."""
 
-    def __init__(self, state_manager: StateManager, device: BLEDevice, interface: int = 0, **kwargs: Any) -> None:
+    def __init__(
+        self,
+        state_manager: StateManager,
+        device: BLEDevice,
+        interface: int = 0,
+        connection_manager: BleConnectionManager | None = None,
+        map_store: Store | None = None,
+        **kwargs: Any,
+    ) -> None:
         """Initialize MammotionBaseBLEDevice."""
-        super().__init__(state_manager)
+        super().__init__(state_manager, map_store=map_store)
+        # shared by the account's mowers, picks the adapter and keeps connections warm when set
+        self.connection_manager = connection_manager
         self._disconnect_strategy = True
         self._ble_sync_task = None
         self._prev_notification = None
@@ -84,6 +95,8 @@ class MammotionBaseBLEDevice(MammotionBaseDevice):
         self._message: BleMessage | None = None
         self._commands: MammotionCommand = MammotionCommand(device.name)
         self.command_queue = asyncio.Queue()
+        self._response_matcher = ResponseMatcher()
+        self._in_flight: set[asyncio.Task] = set()
         self._expected_disconnect = False
         self._connect_lock = asyncio.Lock()
         self._operation_lock = asyncio.Lock()
@@ -146,17 +159,33 @@ class MammotionBaseBLEDevice(MammotionBaseDevice):
         while True:
             # Get the next item from the queue
             key, command, future = await self.command_queue.get()
-            try:
-                # Process the command using _execute_command_locked
-                result = await self._send_command_locked(key, command)
-                # Set the result on the future
+            if can_pipeline(command):
+                # wait for a free slot, then let it run alongside the others
+                while len(self._in_flight) >= MAX_IN_FLIGHT:
+                    await asyncio.wait(self._in_flight, return_when=asyncio.FIRST_COMPLETED)
+                task = asyncio.create_task(self._process_command(key, command, future))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+            else:
+                # could take any response, so it runs on its own
+                if self._in_flight:
+                    await asyncio.wait(self._in_flight)
+                await self._process_command(key, command, future)
+
+    async def _process_command(self, key: str, command: bytes, future: asyncio.Future) -> None:
+        try:
+            # Process the command using _execute_command_locked
+            result = await self._send_command_locked(key, command)
+            # Set the result on the future
+            if not future.done():
                 future.set_result(result)
-            except Exception as ex:
-                # Set the exception on the future if something goes wrong
+        except Exception as ex:
+            # Set the exception on the future if something goes wrong
+            if not future.done():
                 future.set_exception(ex)
-            finally:
-                # Mark the task as done
-                self.command_queue.task_done()
+        finally:
+            # Mark the task as done
+            self.command_queue.task_done()
 
     async def _send_command_with_args(self, key: str, **kwargs) -> bytes | None:
         """Send command to device and read response."""
@@ -260,14 +289,7 @@ class MammotionBaseBLEDevice(MammotionBaseDevice):
                 self._reset_disconnect_timer()
                 return
             _LOGGER.debug("%s: Connecting; RSSI: %s", self.name, self.rssi)
-            client: BleakClientWithServiceCache = await establish_connection(
-                BleakClientWithServiceCache,
-                self.ble_device,
-                self.name,
-                self._disconnected,
-                max_attempts=10,
-                ble_device_callback=lambda: self.ble_device,
-            )
+            client = await self._establish_connection()
             _LOGGER.debug("%s: Connected; RSSI: %s", self.name, self.rssi)
             self._client = client
             self._message = BleMessage(client)
@@ -297,8 +319,45 @@ class MammotionBaseBLEDevice(MammotionBaseDevice):
             await self._ble_sync()
             self.schedule_ble_sync()
 
+    def _connection_in_use(self) -> AbstractAsyncContextManager:
+        if self.connection_manager is None:
+            return nullcontext()
+        return self.connection_manager.use(self.ble_device.address)
+
+    async def _establish_connection(self) -> BleakClientWithServiceCache:
+        if self.connection_manager is None:
+            return await establish_connection(
+                BleakClientWithServiceCache,
+                self.ble_device,
+                self.name,
+                self._disconnected,
+                max_attempts=10,
+                ble_device_callback=lambda: self.ble_device,
+            )
+
+        address = self.ble_device.address
+        self._interface = await self.connection_manager.acquire(address, self._execute_forced_disconnect)
+        _LOGGER.debug("%s: Connecting through %s", self.name, self._interface)
+        try:
+            return await establish_connection(
+                BleakClientWithServiceCache,
+                self.ble_device,
+                self.name,
+                self._disconnected,
+                max_attempts=10,
+                ble_device_callback=lambda: self.ble_device,
+                adapter=self._interface,
+            )
+        except BaseException:
+            self.connection_manager.release(address)
+            raise
+
     async def _send_command_locked(self, key: str, command: bytes) -> bytes:
         """Send command to device and read response."""
+        async with self._connection_in_use():
+            return await self._send_command_connected(key, command)
+
+    async def _send_command_connected(self, key: str, command: bytes) -> bytes:
         await self._ensure_connected()
         try:
             return await self._execute_command_locked(key, command)
@@ -327,8 +386,11 @@ class MammotionBaseBLEDevice(MammotionBaseDevice):
         result = self._message.parseNotification(data)
         if result == 0:
             data = await self._message.parseBlufiNotifyData(True)
+            new_msg = LubaMsg()
             try:
-                self._update_raw_data(data)
+                parsed_msg = LubaMsg().parse(data)
+                self._update_raw_data(parsed_msg, data)
+                new_msg = parsed_msg
             except (KeyError, ValueError, IndexError, UnicodeDecodeError):
                 _LOGGER.exception("Error parsing message %s", data)
                 data = b""
@@ -338,7 +400,6 @@ class MammotionBaseBLEDevice(MammotionBaseDevice):
             _LOGGER.debug("%s: Received notification: %s", self.name, data)
         else:
             return
-        new_msg = LubaMsg().parse(data)
         if betterproto.serialized_on_wire(new_msg.net):
             if new_msg.net.todev_ble_sync != 0 or has_field(new_msg.net.toapp_wifi_iot_status):
                 if has_field(new_msg.net.toapp_wifi_iot_status) and self._commands.get_device_product_key() == "":
@@ -347,9 +408,7 @@ class MammotionBaseBLEDevice(MammotionBaseDevice):
                 return
 
         await self._state_manager.notification(new_msg)
-        # may or may not be correct, some work could be done here to correctly match responses
-        if self._notify_future and not self._notify_future.done():
-            self._notify_future.set_result(data)
+        self._response_matcher.resolve(self.ble_device.address, new_msg, data)
 
         if self._execute_timed_disconnect is None:
             await self._execute_forced_disconnect()
@@ -364,23 +423,21 @@ class MammotionBaseBLEDevice(MammotionBaseDevice):
     async def _execute_command_locked(self, key: str, command: bytes) -> bytes:
         """Execute command and read response."""
         assert self._client is not None
-        self._notify_future = self.loop.create_future()
         self._key = key
+        # register before sending so a fast response can't arrive ahead of its future
+        future = self._response_matcher.register(self.ble_device.address, command)
         _LOGGER.debug("%s: Sending command: %s", self.name, key)
-        await self._message.post_custom_data_bytes(command)
+        try:
+            await self._message.post_custom_data_bytes(command)
+        except BaseException:
+            future.fut.cancel()
+            raise
 
         timeout = 2
-        timeout_handle = self.loop.call_at(self.loop.time() + timeout, _handle_timeout, self._notify_future)
-        timeout_expired = False
         try:
-            notify_msg = await self._notify_future
+            notify_msg = await future.async_get(timeout)
         except asyncio.TimeoutError:
-            timeout_expired = True
             notify_msg = b""
-        finally:
-            if not timeout_expired:
-                timeout_handle.cancel()
-            self._notify_future = None
 
         _LOGGER.debug("%s: Notification received: %s", self.name, notify_msg.hex())
         return notify_msg
@@ -398,11 +455,24 @@ class MammotionBaseBLEDevice(MammotionBaseDevice):
         if not self._write_char:
             _LOGGER.error(CharacteristicMissingError(WRITE_CHAR_UUID))
 
+    @property
+    def _disconnect_delay(self) -> float | None:
+        if self.connection_manager is None:
+            return DISCONNECT_DELAY
+        return self.connection_manager.idle_timeout
+
     def _reset_disconnect_timer(self) -> None:
         """Reset disconnect timer."""
         self._cancel_disconnect_timer()
         self._expected_disconnect = False
-        self._disconnect_timer = self.loop.call_later(DISCONNECT_DELAY, self._disconnect_from_timer)
+        if self._disconnect_delay is None:
+            # kept open until the connection manager evicts it
+            return
+        self._disconnect_timer = self.loop.call_later(self._disconnect_delay, self._disconnect_from_timer)
+
+    def _release_connection(self) -> None:
+        if self.connection_manager is not None:
+            self.connection_manager.release(self.ble_device.address)
 
     def _disconnected(self, client: BleakClientWithServiceCache) -> None:
         """Disconnected callback."""
@@ -416,6 +486,7 @@ class MammotionBaseBLEDevice(MammotionBaseDevice):
         )
         self._cancel_disconnect_timer()
         self._client = None
+        self._release_connection()
 
     def _disconnect_from_timer(self) -> None:
         """Disconnect from device."""
@@ -452,7 +523,7 @@ class MammotionBaseBLEDevice(MammotionBaseDevice):
         _LOGGER.debug(
             "%s: Executing timed disconnect after timeout of %s",
             self.name,
-            DISCONNECT_DELAY,
+            self._disconnect_delay,
         )
         await self._execute_disconnect()
 
@@ -474,6 +545,7 @@ class MammotionBaseBLEDevice(MammotionBaseDevice):
 
         if not client:
             _LOGGER.debug("%s: Already disconnected", self.name)
+            self._release_connection()
             return
         _LOGGER.debug("%s: Disconnecting", self.name)
         try:
@@ -493,6 +565,7 @@ class MammotionBaseBLEDevice(MammotionBaseDevice):
         else:
             _LOGGER.debug("%s: Disconnect completed successfully", self.name)
         self._client = None
+        self._release_connection()
 
     def set_disconnect_strategy(self, disconnect: bool) -> None:
         self._disconnect_strategy = disconnect
@@ -3,9 +3,8 @@ from asyncio import TimerHandle
 import base64
 from collections import deque
 from collections.abc import Awaitable, Callable
-import json
 import logging
-from typing import Any, cast
+from typing import Any
 
 import betterproto
 
@@ -18,28 +17,61 @@ from pymammotion.data.mqtt.status import ThingStatusMessage
 from pymammotion.data.state_manager import StateManager
 from pymammotion.event.event import DataEvent
 from pymammotion.mammotion.commands.mammotion_command import MammotionCommand
+from pymammotion.mammotion.commands.response_matcher import UNSOLICITED_MESSAGES, ResponseMatcher, sub_message_name
 from pymammotion.mammotion.devices.base import MammotionBaseDevice
-from pymammotion.mqtt.mammotion_future import MammotionFuture
+from pymammotion.mqtt.async_mqtt import MammotionAsyncMQTT
 from pymammotion.proto import LubaMsg, has_field
+from pymammotion.utility.store import Store
 
 _LOGGER = logging.getLogger(__name__)
 
+# inbox entry standing for the latest coalesced event of its handler
+_COALESCED = object()
+
 
 class MammotionCloud:
     """Per account MQTT cloud."""
 
-    def __init__(self, mqtt_client: MammotionMQTT, cloud_client: CloudIOTGateway) -> None:
+    def __init__(
+        self,
+        mqtt_client: MammotionMQTT | MammotionAsyncMQTT,
+        cloud_client: CloudIOTGateway,
+        max_in_flight_per_device: int = 1,
+        max_in_flight: int = 8,
+        max_inbox_size: int = 64,
+    ) -> None:
         self.cloud_client = cloud_client
         self.loop = asyncio.get_event_loop()
         self.is_ready = False
-        self.command_queue = asyncio.Queue()
-        self._waiting_queue = deque()
+        # one command pipeline per iot_id so a slow or offline mower only stalls itself
+        self._command_queues: dict[str, asyncio.Queue] = {}
+        self._queue_workers: dict[str, list[asyncio.Task]] = {}
+        self._processing = False
+        self._max_in_flight_per_device = max_in_flight_per_device
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._response_matcher = ResponseMatcher()
         self.mqtt_message_event = DataEvent()
         self.mqtt_properties_event = DataEvent()
         self.mqtt_status_event = DataEvent()
         self.on_ready_event = DataEvent()
         self.on_disconnected_event = DataEvent()
         self.on_connected_event = DataEvent()
+        # cloud devices by iot_id, messages go straight to the device they are about
+        self._devices: dict[str, MammotionBaseCloudDevice] = {}
+        # per device inbox and its consumer, so a slow device only delays its own messages
+        self._max_inbox_size = max_inbox_size
+        self._inboxes: dict[str, deque[tuple[Callable, Any]]] = {}
+        self._inbox_ready: dict[str, asyncio.Event] = {}
+        self._inbox_workers: dict[str, asyncio.Task] = {}
+        # latest status and properties event per (iot_id, handler) not yet handled
+        self._coalesced: dict[tuple[str, Callable], Any] = {}
+        # messages dropped per iot_id because the device fell behind
+        self.dropped_messages: dict[str, int] = {}
+        # handlers by topic suffix, the part after /sys/{productKey}/{deviceName}/
+        self._topic_handlers: dict[str, Callable[[dict[str, Any], str], Awaitable[None]]] = {
+            "app/down/thing/events": self._on_thing_events,
+            "app/down/thing/status": self._on_thing_status,
+        }
         self._operation_lock = asyncio.Lock()
         self._mqtt_client = mqtt_client
         self._mqtt_client.on_connected = self.on_connected
@@ -51,8 +83,9 @@ class MammotionCloud:
         # self._start_sync_task = self.loop.call_later(30, lambda: asyncio.ensure_future(self.start_sync(0)))
 
     async def on_ready(self) -> None:
-        loop = asyncio.get_event_loop()
-        loop.create_task(self.process_queue())
+        self._processing = True
+        for iot_id in self._command_queues:
+            self._start_queue_workers(iot_id)
         await self.on_ready_event.data_event(None)
 
     def is_connected(self) -> bool:
@@ -64,8 +97,22 @@ class MammotionCloud:
     def connect_async(self) -> None:
         self._mqtt_client.connect_async()
 
-    def send_command(self, iot_id: str, command: bytes) -> None:
-        self._mqtt_client.get_cloud_client().send_cloud_command(iot_id, command)
+    async def async_connect(self) -> None:
+        """Connect, in an executor unless the MQTT client runs on the event loop."""
+        if self._mqtt_client.runs_on_loop:
+            self.connect_async()
+        else:
+            await self.loop.run_in_executor(None, self.connect_async)
+
+    async def async_disconnect(self) -> None:
+        """Disconnect, in an executor unless the MQTT client runs on the event loop."""
+        if self._mqtt_client.runs_on_loop:
+            self.disconnect()
+        else:
+            await self.loop.run_in_executor(None, self.disconnect)
+
+    async def send_command(self, iot_id: str, command: bytes) -> None:
+        await self.cloud_client.async_send_cloud_command(iot_id, command)
 
     async def on_connected(self) -> None:
         """Callback for when MQTT connects."""
@@ -75,21 +122,50 @@ class MammotionCloud:
         """Callback for when MQTT disconnects."""
         await self.on_disconnected_event.data_event(None)
 
-    async def process_queue(self) -> None:
+    def get_command_queue(self, iot_id: str) -> asyncio.Queue:
+        """Return the command queue for a device, creating its pipeline on first use."""
+        queue = self._command_queues.get(iot_id)
+        if queue is None:
+            queue = self._command_queues[iot_id] = asyncio.Queue()
+            if self._processing:
+                self._start_queue_workers(iot_id)
+        return queue
+
+    def has_queued_commands(self, iot_id: str) -> bool:
+        """Return True if commands are waiting to be sent to the device."""
+        queue = self._command_queues.get(iot_id)
+        return queue is not None and not queue.empty()
+
+    def _start_queue_workers(self, iot_id: str) -> None:
+        """Start (or restart) the workers draining a device's command queue."""
+        workers = [task for task in self._queue_workers.get(iot_id, []) if not task.done()]
+        while len(workers) < self._max_in_flight_per_device:
+            workers.append(self.loop.create_task(self.process_queue(self._command_queues[iot_id])))
+        self._queue_workers[iot_id] = workers
+
+    async def process_queue(self, queue: asyncio.Queue) -> None:
         while True:
-            # Get the next item from the queue
-            iot_id, key, command, future = await self.command_queue.get()
+            # Get the next item from the device queue
+            iot_id, key, command, future = await queue.get()
             try:
-                # Process the command using _execute_command_locked
-                result = await self._execute_command_locked(iot_id, key, command)
+                # Process the command using _execute_command_locked, bounded by the account wide limit
+                async with self._in_flight:
+                    result = await self._execute_command_locked(iot_id, key, command)
                 # Set the result on the future
-                future.set_result(result)
+                if not future.done():
+                    future.set_result(result)
             except Exception as ex:
                 # Set the exception on the future if something goes wrong
-                future.set_exception(ex)
+                if not future.done():
+                    future.set_exception(ex)
             finally:
                 # Mark the task as done
-                self.command_queue.task_done()
+                queue.task_done()
+
+    async def execute_command(self, iot_id: str, key: str, command: bytes) -> bytes:
+        """Send a command alongside the device's queue, still bounded by the account wide limit."""
+        async with self._in_flight:
+            return await self._execute_command_locked(iot_id, key, command)
 
     async def _execute_command_locked(self, iot_id: str, key: str, command: bytes) -> bytes:
         """Execute command and read response."""
@@ -97,64 +173,168 @@ class MammotionCloud:
         self._key = key
         _LOGGER.debug("Sending command: %s", key)
 
-        await self.loop.run_in_executor(None, self._mqtt_client.get_cloud_client().send_cloud_command, iot_id, command)
-        future = MammotionFuture(iot_id)
-        self._waiting_queue.append(future)
+        # register before sending so a fast response can't arrive ahead of its future
+        future = self._response_matcher.register(iot_id, command)
+        try:
+            future.message_id = await self.cloud_client.async_send_cloud_command(iot_id, command)
+        except Exception:
+            future.fut.cancel()
+            raise
         timeout = 5
         try:
             notify_msg = await future.async_get(timeout)
         except asyncio.TimeoutError:
-            _LOGGER.debug("command_locked TimeoutError")
+            _LOGGER.debug("command_locked TimeoutError %s message_id: %s", key, future.message_id)
             notify_msg = b""
 
         _LOGGER.debug("%s: Message received", iot_id)
 
         return notify_msg
 
-    async def _on_mqtt_message(self, topic: str, payload: str, iot_id: str) -> None:
-        """Handle incoming MQTT messages."""
-        _LOGGER.debug("MQTT message received on topic %s: %s, iot_id: %s", topic, payload, iot_id)
+    def register_device(self, device: "MammotionBaseCloudDevice") -> None:
+        """Route the messages of the device's iot_id to it."""
+        self._devices[device.iot_id] = device
+        if device.iot_id not in self._inboxes:
+            inbox = self._inboxes[device.iot_id] = deque()
+            ready = self._inbox_ready[device.iot_id] = asyncio.Event()
+            self._inbox_workers[device.iot_id] = self.loop.create_task(self._drain_inbox(device.iot_id, inbox, ready))
+
+    def unregister_device(self, device: "MammotionBaseCloudDevice") -> None:
+        """Stop routing messages to the device, unless it was already replaced."""
+        if self._devices.get(device.iot_id) is not device:
+            return
+        del self._devices[device.iot_id]
+        del self._inboxes[device.iot_id]
+        del self._inbox_ready[device.iot_id]
+        self._inbox_workers.pop(device.iot_id).cancel()
+        for key in [key for key in self._coalesced if key[0] == device.iot_id]:
+            del self._coalesced[key]
+
+    def _deliver(
+        self,
+        iot_id: str,
+        handler: Callable[["MammotionBaseCloudDevice", Any], Awaitable[None]],
+        message: Any,
+        coalesce: bool = False,
+    ) -> None:
+        """Queue a message for the device without waiting.
+
+        A coalesced status or properties event replaces the one of its kind still
+        waiting in the inbox. When the inbox is full the oldest message nothing is
+        waiting for, a coalesced event or a periodic report, makes room. Messages
+        that may answer a command are never dropped, so the inbox can grow past
+        its size when it holds nothing else.
+        """
+        inbox = self._inboxes.get(iot_id)
+        if inbox is None:
+            return
+        if coalesce:
+            key = (iot_id, handler)
+            replaced = key in self._coalesced
+            self._coalesced[key] = message
+            if replaced:
+                self._count_drop(iot_id, message)
+                return
+            message = _COALESCED
+        if len(inbox) >= self._max_inbox_size:
+            self._make_room(iot_id, inbox)
+        inbox.append((handler, message))
+        self._inbox_ready[iot_id].set()
+
+    def _make_room(self, iot_id: str, inbox: deque[tuple[Callable, Any]]) -> None:
+        """Drop the oldest inbox entry that no command can be waiting for."""
+        for index, (handler, message) in enumerate(inbox):
+            if message is _COALESCED:
+                dropped = self._coalesced.pop((iot_id, handler))
+            elif self._is_periodic_report(iot_id, message):
+                dropped = message
+            else:
+                continue
+            del inbox[index]
+            self._count_drop(iot_id, dropped)
+            return
+        _LOGGER.debug("%s: inbox full of possible responses, keeping all %d", iot_id, len(inbox))
+
+    def _is_periodic_report(self, iot_id: str, message: Any) -> bool:
+        if not isinstance(message, ThingEventMessage):
+            return False
+        try:
+            msg = LubaMsg().parse(base64.b64decode(message.params.value.content))
+        except (KeyError, ValueError, IndexError, UnicodeDecodeError):
+            return False
+        return sub_message_name(msg) in UNSOLICITED_MESSAGES and not self._response_matcher.is_awaited(iot_id, msg)
 
-        json_str = json.dumps(payload)
-        payload = json.loads(json_str)
+    def _count_drop(self, iot_id: str, message: Any) -> None:
+        dropped = self.dropped_messages[iot_id] = self.dropped_messages.get(iot_id, 0) + 1
+        _LOGGER.debug("%s: falling behind, dropped an older %s (%d so far)", iot_id, type(message).__name__, dropped)
 
-        await self._parse_mqtt_response(topic, payload)
+    async def _drain_inbox(self, iot_id: str, inbox: deque[tuple[Callable, Any]], ready: asyncio.Event) -> None:
+        while True:
+            await ready.wait()
+            while inbox:
+                handler, message = inbox.popleft()
+                if message is _COALESCED:
+                    message = self._coalesced.pop((iot_id, handler))
+                try:
+                    # looked up per message so a replaced device gets what is still queued
+                    if (device := self._devices.get(iot_id)) is not None:
+                        await handler(device, message)
+                except Exception:
+                    _LOGGER.exception("%s: error handling message", iot_id)
+            ready.clear()
+
+    async def _on_mqtt_message(self, topic: str, payload: dict[str, Any], iot_id: str) -> None:
+        """Handle incoming MQTT messages."""
+        _LOGGER.debug("MQTT message received on topic %s: %s, iot_id: %s", topic, payload, iot_id)
+        await self._parse_mqtt_response(topic, payload, iot_id)
 
-    async def _parse_mqtt_response(self, topic: str, payload: dict) -> None:
+    async def _parse_mqtt_response(self, topic: str, payload: dict[str, Any], iot_id: str) -> None:
         """Parse the MQTT response."""
-        if topic.endswith("/app/down/thing/events"):
-            _LOGGER.debug("Thing event received")
-            event = ThingEventMessage.from_dicts(payload)
-            params = event.params
-            if isinstance(params, dict) or params.identifier is None:
-                _LOGGER.debug("Received dict params: %s", params)
-                return
-            if params.identifier == "device_protobuf_msg_event" and event.method == "thing.events":
-                _LOGGER.debug("Protobuf event")
-                # Call the callbacks for each cloudDevice
-                await self.mqtt_message_event.data_event(event)
-            if event.method == "thing.properties":
-                await self.mqtt_properties_event.data_event(event)
-                _LOGGER.debug(event)
-        elif topic.endswith("/app/down/thing/status"):
-            status = ThingStatusMessage.from_dict(payload)
-            await self.mqtt_status_event.data_event(status)
+        # topics are /sys/{productKey}/{deviceName}/{suffix}
+        handler = self._topic_handlers.get(topic.split("/", 4)[-1])
+        if handler is not None:
+            await handler(payload, iot_id)
+
+    async def _on_thing_events(self, payload: dict[str, Any], iot_id: str) -> None:
+        _LOGGER.debug("Thing event received")
+        event = ThingEventMessage.from_dicts(payload)
+        params = event.params
+        if isinstance(params, dict) or params.identifier is None:
+            _LOGGER.debug("Received dict params: %s", params)
+            return
+        if params.identifier == "device_protobuf_msg_event" and event.method == "thing.events":
+            _LOGGER.debug("Protobuf event")
+            self._deliver(iot_id, MammotionBaseCloudDevice._parse_message_for_device, event)
+            await self.mqtt_message_event.data_event(event)
+        if event.method == "thing.properties":
+            self._deliver(
+                iot_id, MammotionBaseCloudDevice._parse_message_properties_for_device, event, coalesce=True
+            )
+            await self.mqtt_properties_event.data_event(event)
+            _LOGGER.debug(event)
+
+    async def _on_thing_status(self, payload: dict[str, Any], iot_id: str) -> None:
+        status = ThingStatusMessage.from_dict(payload)
+        self._deliver(iot_id, MammotionBaseCloudDevice._parse_message_status_for_device, status, coalesce=True)
+        await self.mqtt_status_event.data_event(status)
 
     def _disconnect(self) -> None:
         """Disconnect the MQTT client."""
         self._mqtt_client.disconnect()
 
-    @property
-    def waiting_queue(self):
-        return self._waiting_queue
+    def resolve_response(self, iot_id: str, msg: LubaMsg, data: bytes) -> bool:
+        """Hand a device message to the command waiting for it, if any."""
+        return self._response_matcher.resolve(iot_id, msg, data)
 
 
 class MammotionBaseCloudDevice(MammotionBaseDevice):
     """Base class for Mammotion Cloud devices."""
 
-    def __init__(self, mqtt: MammotionCloud, cloud_device: Device, state_manager: StateManager) -> None:
+    def __init__(
+        self, mqtt: MammotionCloud, cloud_device: Device, state_manager: StateManager, map_store: Store | None = None
+    ) -> None:
         """Initialize MammotionBaseCloudDevice."""
-        super().__init__(state_manager, cloud_device)
+        super().__init__(state_manager, cloud_device, map_store)
         self._ble_sync_task: TimerHandle | None = None
         self.stopped = False
         self.on_ready_callback: Callable[[], Awaitable[None]] | None = None
@@ -165,9 +345,7 @@ class MammotionBaseCloudDevice(MammotionBaseDevice):
         self._command_futures = {}
         self._commands: MammotionCommand = MammotionCommand(cloud_device.deviceName)
         self.currentID = ""
-        self._mqtt.mqtt_message_event.add_subscribers(self._parse_message_for_device)
-        self._mqtt.mqtt_properties_event.add_subscribers(self._parse_message_properties_for_device)
-        self._mqtt.mqtt_status_event.add_subscribers(self._parse_message_status_for_device)
+        self._mqtt.register_device(self)
         self._mqtt.on_ready_event.add_subscribers(self.on_ready)
         self._mqtt.on_disconnected_event.add_subscribers(self.on_disconnect)
         self._mqtt.on_connected_event.add_subscribers(self.on_connect)
@@ -182,7 +360,6 @@ class MammotionBaseCloudDevice(MammotionBaseDevice):
         self._mqtt.on_ready_event.remove_subscribers(self.on_ready)
         self._mqtt.on_disconnected_event.remove_subscribers(self.on_disconnect)
         self._mqtt.on_connected_event.remove_subscribers(self.on_connect)
-        self._mqtt.mqtt_message_event.remove_subscribers(self._parse_message_for_device)
         self._state_manager.cloud_gethash_ack_callback = None
         self._state_manager.cloud_get_commondata_ack_callback = None
         if self._ble_sync_task:
@@ -218,9 +395,11 @@ class MammotionBaseCloudDevice(MammotionBaseDevice):
         """Stop all tasks and disconnect."""
         if self._ble_sync_task:
             self._ble_sync_task.cancel()
+        self._mqtt.unregister_device(self)
         self.stopped = True
 
     async def start(self) -> None:
+        self._mqtt.register_device(self)
         await self._ble_sync()
         if self._ble_sync_task is None or self._ble_sync_task.cancelled():
             await self.run_periodic_sync_task()
@@ -230,8 +409,7 @@ class MammotionBaseCloudDevice(MammotionBaseDevice):
 
     async def _ble_sync(self) -> None:
         command_bytes = self._commands.send_todev_ble_sync(3)
-        loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, self._mqtt.send_command, self.iot_id, command_bytes)
+        await self._mqtt.send_command(self.iot_id, command_bytes)
 
     async def run_periodic_sync_task(self) -> None:
         """Send ble sync to robot."""
@@ -255,14 +433,23 @@ class MammotionBaseCloudDevice(MammotionBaseDevice):
         future = asyncio.Future()
         # Put the command in the queue as a tuple (key, command, future)
         command_bytes = getattr(self._commands, key)(**kwargs)
-        await self._mqtt.command_queue.put((self.iot_id, key, command_bytes, future))
+        await self._mqtt.get_command_queue(self.iot_id).put((self.iot_id, key, command_bytes, future))
         # Wait for the future to be resolved
         try:
             return await future
         except asyncio.CancelledError:
             """Try again once."""
             future = asyncio.Future()
-            await self._mqtt.command_queue.put((self.iot_id, key, command_bytes, future))
+            await self._mqtt.get_command_queue(self.iot_id).put((self.iot_id, key, command_bytes, future))
+
+    async def queue_map_command(self, key: str, **kwargs: Any) -> bytes:
+        """Send a map sync request without waiting behind the device's queue.
+
+        The queue runs one command at a time per device, map sync requests are
+        reads matched to their own acks so MapSync can keep a window of them in flight.
+        """
+        command_bytes = getattr(self._commands, key)(**kwargs)
+        return await self._mqtt.execute_command(self.iot_id, key, command_bytes)
 
     def _extract_message_id(self, payload: dict) -> str:
         """Extract the message ID from the payload."""
@@ -277,14 +464,6 @@ class MammotionBaseCloudDevice(MammotionBaseDevice):
             _LOGGER.error("Error extracting encoded message. Payload: %s", payload)
             return ""
 
-    @staticmethod
-    def dequeue_by_iot_id(queue, iot_id):
-        for item in queue:
-            if item.iot_id == iot_id:
-                queue.remove(item)
-                return item
-        return None
-
     async def _parse_message_properties_for_device(self, event: ThingPropertiesMessage) -> None:
         if event.params.iotId != self.iot_id:
             return
@@ -303,8 +482,9 @@ class MammotionBaseCloudDevice(MammotionBaseDevice):
             return
         binary_data = base64.b64decode(params.value.content)
         try:
-            self._update_raw_data(binary_data)
-            new_msg = LubaMsg().parse(binary_data)
+            parsed_msg = LubaMsg().parse(binary_data)
+            self._update_raw_data(parsed_msg, binary_data)
+            new_msg = parsed_msg
         except (KeyError, ValueError, IndexError, UnicodeDecodeError):
             _LOGGER.exception("Error parsing message %s", binary_data)
 
@@ -320,14 +500,7 @@ class MammotionBaseCloudDevice(MammotionBaseDevice):
 
         await self._state_manager.notification(new_msg)
 
-        if len(self._mqtt.waiting_queue) > 0:
-            fut: MammotionFuture = self.dequeue_by_iot_id(self._mqtt.waiting_queue, self.iot_id)
-            if fut is None:
-                return
-            while fut.fut.cancelled() and len(self._mqtt.waiting_queue) > 0:
-                fut = self.dequeue_by_iot_id(self._mqtt.waiting_queue, self.iot_id)
-            if not fut.fut.cancelled():
-                fut.resolve(cast(bytes, binary_data))
+        self._mqtt.resolve_response(self.iot_id, new_msg, binary_data)
 
     @property
     def mqtt(self):
@@ -0,0 +1,122 @@
+"""Pipelined download of the map data of a mower."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Iterator
+import logging
+from typing import TYPE_CHECKING, Any
+
+from pymammotion.data.model import RegionData
+from pymammotion.data.model.hash_list import PathType
+
+if TYPE_CHECKING:
+    from pymammotion.mammotion.devices.base import MammotionBaseDevice
+
+_LOGGER = logging.getLogger(__name__)
+
+# frames of the root hash list are tracked under this hash
+ROOT_HASH = 0
+
+
+class MapSync:
+    """Keep a window of frame requests outstanding until the map is complete.
+
+    What to request is always derived from the device's HashList: missing root
+    hash list frames, gaps in hashes we have started receiving, then hashes we
+    have nothing for yet. Requests run as background tasks through the device's
+    queue_map_command, which lets up to ``window`` of them wait for their acks
+    at the same time. Frames are requested as current_frame = wanted - 1, the same way the
+    app acknowledges the previous frame.
+    """
+
+    def __init__(self, device: MammotionBaseDevice, window: int = 4, max_attempts: int = 3) -> None:
+        self._device = device
+        self._window = window
+        self._max_attempts = max_attempts
+        self._in_flight: dict[tuple[int, int], asyncio.Task] = {}
+        self._attempts: dict[tuple[int, int], int] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        # awaited once nothing is left to request, e.g. to persist the map
+        self.on_complete: Callable[[], Awaitable[None]] | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> asyncio.Task:
+        """Start syncing, or wake the running sync to look at newly received frames."""
+        if self.is_running:
+            self._wakeup.set()
+            return self._task
+        self._attempts.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+    async def wait(self) -> None:
+        """Wait until the sync has nothing left to request."""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        for task in list(self._in_flight.values()):
+            task.cancel()
+        self._in_flight.clear()
+
+    def _wanted(self) -> Iterator[tuple[tuple[int, int], str, dict[str, Any]]]:
+        """Yield (key, command, kwargs) for every frame we are still missing, in request order."""
+        hash_list = self._device.mower.map
+
+        for frame in hash_list.missing_hash_frame():
+            yield (
+                (ROOT_HASH, frame),
+                "get_hash_response",
+                {"total_frame": hash_list.root_hash_list.total_frame, "current_frame": frame - 1},
+            )
+
+        for hash_id, path_type, frames in hash_list.incomplete_hashes:
+            for frame in frames.missing_frames:
+                region_data = RegionData()
+                region_data.hash = hash_id
+                region_data.action = frames.data[0].action if path_type != PathType.SVG else None
+                region_data.type = path_type
+                region_data.total_frame = frames.total_frame
+                region_data.current_frame = frame - 1
+                yield (hash_id, frame), "get_regional_data", {"regional_data": region_data}
+
+        for hash_id in hash_list.missing_hashlist:
+            yield (hash_id, 1), "synchronize_hash_data", {"hash_num": hash_id}
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            for key, command, kwargs in self._wanted():
+                if len(self._in_flight) >= self._window:
+                    break
+                if key in self._in_flight:
+                    continue
+                attempts = self._attempts.get(key, 0)
+                if attempts >= self._max_attempts:
+                    continue
+                self._attempts[key] = attempts + 1
+                self._in_flight[key] = asyncio.create_task(self._request(key, command, kwargs))
+
+            if not self._in_flight:
+                # complete, or everything left has run out of attempts
+                _LOGGER.debug("Map sync finished for %s", self._device.mower.name)
+                if self.on_complete is not None:
+                    await self.on_complete()
+                return
+            await self._wakeup.wait()
+
+    async def _request(self, key: tuple[int, int], command: str, kwargs: dict[str, Any]) -> None:
+        try:
+            await self._device.queue_map_command(command, **kwargs)
+        except Exception as ex:
+            _LOGGER.debug("Map sync request %s for %s failed: %s", command, key, ex)
+        finally:
+            self._in_flight.pop(key, None)
+            self._wakeup.set()
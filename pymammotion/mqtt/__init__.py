@@ -1,5 +1,6 @@
 """Package for MammotionMQTT."""
 
+from .async_mqtt import MammotionAsyncMQTT
 from .mammotion_mqtt import MammotionMQTT
 
-__all__ = ["MammotionMQTT"]
+__all__ = ["MammotionAsyncMQTT", "MammotionMQTT"]
@@ -0,0 +1,258 @@
+"""MQTT client for pymammotion that runs paho on the asyncio event loop."""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Coroutine
+from logging import getLogger
+import socket
+import ssl
+from typing import Any
+
+import orjson
+from paho.mqtt import client as mqtt
+from paho.mqtt.enums import CallbackAPIVersion
+
+from pymammotion.aliyun.cloud_gateway import CloudIOTGateway
+from pymammotion.mqtt.linkkit.linkkit import ALIYUN_BROKER_CA_DATA
+from pymammotion.mqtt.mammotion_mqtt import app_topics, bind_message, mqtt_credentials
+
+logger = getLogger(__name__)
+
+MQTT_PORT = 8883
+KEEPALIVE = 60
+# paho's keepalive and retry bookkeeping, same interval its own loop uses
+MISC_INTERVAL = 1.0
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 60
+
+
+class MammotionAsyncMQTT:
+    """Drop-in alternative to MammotionMQTT without the LinkKit threads.
+
+    Authenticates with the same Aliyun credentials and subscribes to the same
+    topics, but the paho socket is watched with add_reader/add_writer so
+    packets are read, and callbacks run, on the event loop. Only the blocking
+    TCP connect and TLS handshake go to an executor.
+
+    connect_async and disconnect only schedule work, they must be called from
+    the event loop.
+    """
+
+    runs_on_loop = True
+
+    def __init__(
+        self,
+        region_id: str,
+        product_key: str,
+        device_name: str,
+        device_secret: str,
+        iot_token: str,
+        cloud_client: CloudIOTGateway,
+        client_id: str | None = None,
+    ) -> None:
+        """Create instance of MammotionAsyncMQTT."""
+        self._cloud_client = cloud_client
+        self.is_connected = False
+        self.is_ready = False
+        self.on_connected: Callable[[], Awaitable[None]] | None = None
+        self.on_ready: Callable[[], Awaitable[None]] | None = None
+        self.on_error: Callable[[str], Awaitable[None]] | None = None
+        self.on_disconnected: Callable[[], Awaitable[None]] | None = None
+        self.on_message: Callable[[str, dict[str, Any], str], Awaitable[None]] | None = None
+
+        self._product_key = product_key
+        self._device_name = device_name
+        self._device_secret = device_secret
+        self._iot_token = iot_token
+        if client_id is None:
+            client_id = f"python-{device_name}"
+        self._mqtt_client_id, self._mqtt_username, self._mqtt_password = mqtt_credentials(
+            client_id, product_key, device_name, device_secret
+        )
+        self._client_id = client_id
+        self._mqtt_host = f"{self._product_key}.iot-as-mqtt.{region_id}.aliyuncs.com"
+        self.loop = asyncio.get_running_loop()
+
+        self._client = mqtt.Client(
+            CallbackAPIVersion.VERSION2,
+            client_id=self._mqtt_client_id,
+            clean_session=True,
+            protocol=mqtt.MQTTv311,
+        )
+        self._client.username_pw_set(self._mqtt_username, self._mqtt_password)
+        self._client.tls_set_context(ssl.create_default_context(ssl.Purpose.SERVER_AUTH, cadata=ALIYUN_BROKER_CA_DATA))
+        self._client.on_connect = self._on_connect
+        self._client.on_disconnect = self._on_disconnect
+        self._client.on_message = self._on_message
+
+        self._sock: socket.socket | None = None
+        self._misc_timer: asyncio.TimerHandle | None = None
+        self._connect_task: asyncio.Task | None = None
+        self._reconnect_delay = RECONNECT_MIN_DELAY
+        self._stopping = False
+        self._tasks: set[asyncio.Task] = set()
+
+    def connect_async(self) -> None:
+        """Start connecting to the MQTT server, reconnecting until disconnect is called."""
+        logger.info("Connecting...")
+        self._connect()
+
+    def disconnect(self) -> None:
+        """Disconnect from MQTT Server."""
+        logger.info("Disconnecting...")
+        # also stops a reconnect that is waiting out its backoff
+        self._stopping = True
+        if self._connect_task is not None and not self._connect_task.done():
+            self._connect_task.cancel()
+        if self._sock is not None:
+            self._client.disconnect()
+            # flush the DISCONNECT packet, paho closes the socket once it is sent
+            self._client.loop_write()
+        self._stop_misc()
+
+    def _connect(self, delay: float = 0) -> None:
+        self._stopping = False
+        if self._connect_task is None or self._connect_task.done():
+            self._connect_task = self.loop.create_task(self._connect_loop(delay))
+
+    async def _connect_loop(self, delay: float) -> None:
+        while True:
+            if delay:
+                await asyncio.sleep(delay)
+            if self._stopping:
+                return
+            self._client.connect_async(self._mqtt_host, MQTT_PORT, keepalive=KEEPALIVE)
+            # socket callbacks are only set once connected, so paho writes CONNECT in the executor
+            self._unwatch_socket()
+            connect = self.loop.run_in_executor(None, self._client.reconnect)
+            try:
+                await asyncio.shield(connect)
+            except (OSError, mqtt.WebsocketConnectionError) as ex:
+                logger.debug("MQTT connect failed: %s", ex)
+            except asyncio.CancelledError:
+                # the executor can't be interrupted, drop the socket once it has connected
+                connect.add_done_callback(self._close_abandoned_socket)
+                raise
+            if self._client.socket() is not None:
+                self._watch_socket()
+                return
+            delay = self._next_reconnect_delay()
+
+    def _close_abandoned_socket(self, connect: asyncio.Future) -> None:
+        if connect.cancelled() or connect.exception() is not None or self._client.socket() is None:
+            return
+        self._client.disconnect()
+        self._client.loop_write()
+
+    def _next_reconnect_delay(self) -> float:
+        delay = self._reconnect_delay
+        self._reconnect_delay = min(self._reconnect_delay * 2, RECONNECT_MAX_DELAY)
+        return delay
+
+    def _watch_socket(self) -> None:
+        self._sock = self._client.socket()
+        self._client.on_socket_close = self._on_socket_close
+        self._client.on_socket_register_write = self._on_socket_register_write
+        self._client.on_socket_unregister_write = self._on_socket_unregister_write
+        self.loop.add_reader(self._sock, self._read)
+        if self._client.want_write():
+            self.loop.add_writer(self._sock, self._write)
+        self._schedule_misc()
+
+    def _unwatch_socket(self) -> None:
+        self._client.on_socket_close = None
+        self._client.on_socket_register_write = None
+        self._client.on_socket_unregister_write = None
+        if self._sock is not None:
+            self.loop.remove_reader(self._sock)
+            self.loop.remove_writer(self._sock)
+            self._sock = None
+
+    def _read(self) -> None:
+        self._client.loop_read()
+        # TLS may hold decrypted bytes the selector will not report
+        while isinstance(sock := self._client.socket(), ssl.SSLSocket) and sock.pending():
+            self._client.loop_read()
+
+    def _write(self) -> None:
+        self._client.loop_write()
+
+    def _misc(self) -> None:
+        self._misc_timer = None
+        if self._client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            self._schedule_misc()
+
+    def _schedule_misc(self) -> None:
+        if self._misc_timer is None:
+            self._misc_timer = self.loop.call_later(MISC_INTERVAL, self._misc)
+
+    def _stop_misc(self) -> None:
+        if self._misc_timer is not None:
+            self._misc_timer.cancel()
+            self._misc_timer = None
+
+    def _on_socket_close(self, _client, _userdata, _sock) -> None:
+        self._unwatch_socket()
+        self._stop_misc()
+
+    def _on_socket_register_write(self, _client, _userdata, sock) -> None:
+        self.loop.add_writer(sock, self._write)
+
+    def _on_socket_unregister_write(self, _client, _userdata, sock) -> None:
+        self.loop.remove_writer(sock)
+
+    def _run(self, coro: Coroutine[Any, Any, None]) -> None:
+        """Run a callback coroutine, keeping a reference until it finishes."""
+        task = self.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_connect(self, _client, _userdata, _flags, reason_code, _properties) -> None:
+        """Is called once the broker acknowledged the connection."""
+        logger.debug("on_connect, rc:%s", reason_code)
+        if reason_code.is_failure:
+            if self.on_error is not None:
+                self._run(self.on_error(str(reason_code)))
+            return
+        self._reconnect_delay = RECONNECT_MIN_DELAY
+        self.is_connected = True
+        if self.on_connected is not None:
+            self._run(self.on_connected())
+
+        for topic in app_topics(self._product_key, self._device_name):
+            self._client.subscribe(topic, qos=1)
+        self._client.publish(
+            f"/sys/{self._product_key}/{self._device_name}/app/up/account/bind",
+            bind_message(self._mqtt_username, self._iot_token),
+            qos=1,
+        )
+
+        if self.on_ready:
+            self.is_ready = True
+            self._run(self.on_ready())
+
+    def _on_disconnect(self, _client, _userdata, _flags, reason_code, _properties) -> None:
+        """Is called on disconnect."""
+        logger.info("Disconnected: %s", reason_code)
+        self.is_connected = False
+        self.is_ready = False
+        if self.on_disconnected:
+            self._run(self.on_disconnected())
+        if not self._stopping:
+            self._connect(self._next_reconnect_delay())
+
+    def _on_message(self, _client, _userdata, message: mqtt.MQTTMessage) -> None:
+        """Is called when a message comes in."""
+        logger.debug("on_message, topic:%s, payload:%s", message.topic, message.payload)
+        try:
+            payload = orjson.loads(message.payload)
+        except orjson.JSONDecodeError as ex:
+            logger.error("Invalid payload on topic %s: %s", message.topic, ex)
+            return
+        params = payload.get("params") if isinstance(payload, dict) else None
+        iot_id = params.get("iotId", "") if isinstance(params, dict) else ""
+        if iot_id != "" and self.on_message:
+            self._run(self.on_message(message.topic, payload, iot_id))
+
+    def get_cloud_client(self) -> CloudIOTGateway:
+        """Return internal cloud client."""
+        return self._cloud_client
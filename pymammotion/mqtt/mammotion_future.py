@@ -6,8 +6,10 @@ import async_timeout
 class MammotionFuture:
     """Create futures for each MQTT Message."""
 
-    def __init__(self, iot_id) -> None:
+    def __init__(self, iot_id, request_id: str = "") -> None:
         self.iot_id = iot_id
+        self.request_id = request_id
+        self.message_id: str | None = None
         self.fut: Future = Future()
         self.loop = self.fut.get_loop()
 
@@ -8,8 +8,10 @@ import hmac
 import json
 import logging
 from logging import getLogger
+from typing import Any
 
 import betterproto
+import orjson
 from paho.mqtt.client import MQTTMessage
 
 from pymammotion.aliyun.cloud_gateway import CloudIOTGateway
@@ -21,10 +23,49 @@ from pymammotion.proto import LubaMsg
 
 logger = getLogger(__name__)
 
+APP_TOPICS = (
+    "app/down/account/bind_reply",
+    "app/down/thing/event/property/post_reply",
+    "app/down/thing/wifi/status/notify",
+    "app/down/thing/wifi/connect/event/notify",
+    "app/down/_thing/event/notify",
+    "app/down/thing/events",
+    "app/down/thing/status",
+    "app/down/thing/properties",
+    "app/down/thing/model/down_raw",
+)
+
+
+def app_topics(product_key: str, device_name: str) -> list[str]:
+    """Return the topics the app subscribes to once connected."""
+    return [f"/sys/{product_key}/{device_name}/{topic}" for topic in APP_TOPICS]
+
+
+def bind_message(username: str, iot_token: str) -> str:
+    """Return the account bind request that makes the broker forward the account's devices."""
+    return json.dumps(
+        {
+            "id": "msgid1",
+            "version": "1.0",
+            "request": {"clientId": username},
+            "params": {"iotToken": iot_token},
+        }
+    )
+
+
+def mqtt_credentials(client_id: str, product_key: str, device_name: str, device_secret: str) -> tuple[str, str, str]:
+    """Return the Aliyun (client id, username, password) for securemode=2,signmethod=hmacsha1."""
+    sign_content = f"clientId{client_id}deviceName{device_name}productKey{product_key}"
+    password = hmac.new(device_secret.encode("utf-8"), sign_content.encode("utf-8"), hashlib.sha1).hexdigest()
+    return f"{client_id}|securemode=2,signmethod=hmacsha1|", f"{device_name}&{product_key}", password
+
 
 class MammotionMQTT:
     """MQTT client for pymammotion."""
 
+    # connect_async and disconnect block, so callers run them in an executor
+    runs_on_loop = False
+
     def __init__(
         self,
         region_id: str,
@@ -44,21 +85,18 @@ class MammotionMQTT:
         self.on_ready: Callable[[], Awaitable[None]] | None = None
         self.on_error: Callable[[str], Awaitable[None]] | None = None
         self.on_disconnected: Callable[[], Awaitable[None]] | None = None
-        self.on_message: Callable[[str, str, str], Awaitable[None]] | None = None
+        self.on_message: Callable[[str, dict[str, Any], str], Awaitable[None]] | None = None
 
         self._product_key = product_key
         self._device_name = device_name
         self._device_secret = device_secret
         self._iot_token = iot_token
-        self._mqtt_username = f"{device_name}&{product_key}"
         # linkkit provides the correct MQTT service for all of this and uses paho under the hood
         if client_id is None:
             client_id = f"python-{device_name}"
-        self._mqtt_client_id = f"{client_id}|securemode=2,signmethod=hmacsha1|"
-        sign_content = f"clientId{client_id}deviceName{device_name}productKey{product_key}"
-        self._mqtt_password = hmac.new(
-            device_secret.encode("utf-8"), sign_content.encode("utf-8"), hashlib.sha1
-        ).hexdigest()
+        self._mqtt_client_id, self._mqtt_username, self._mqtt_password = mqtt_credentials(
+            client_id, product_key, device_name, device_secret
+        )
 
         self._client_id = client_id
         self.loop = asyncio.get_running_loop()
@@ -100,38 +138,12 @@ class MammotionMQTT:
         self.is_connected = True
         # logger.debug('subscribe_topic, topic:%s' % echo_topic)
         # self._linkkit_client.subscribe_topic(echo_topic, 0)
-        self._linkkit_client.subscribe_topic(
-            f"/sys/{self._product_key}/{self._device_name}/app/down/account/bind_reply"
-        )
-        self._linkkit_client.subscribe_topic(
-            f"/sys/{self._product_key}/{self._device_name}/app/down/thing/event/property/post_reply"
-        )
-        self._linkkit_client.subscribe_topic(
-            f"/sys/{self._product_key}/{self._device_name}/app/down/thing/wifi/status/notify"
-        )
-        self._linkkit_client.subscribe_topic(
-            f"/sys/{self._product_key}/{self._device_name}/app/down/thing/wifi/connect/event/notify"
-        )
-        self._linkkit_client.subscribe_topic(
-            f"/sys/{self._product_key}/{self._device_name}/app/down/_thing/event/notify"
-        )
-        self._linkkit_client.subscribe_topic(f"/sys/{self._product_key}/{self._device_name}/app/down/thing/events")
-        self._linkkit_client.subscribe_topic(f"/sys/{self._product_key}/{self._device_name}/app/down/thing/status")
-        self._linkkit_client.subscribe_topic(f"/sys/{self._product_key}/{self._device_name}/app/down/thing/properties")
-        self._linkkit_client.subscribe_topic(
-            f"/sys/{self._product_key}/{self._device_name}/app/down/thing/model/down_raw"
-        )
+        for topic in app_topics(self._product_key, self._device_name):
+            self._linkkit_client.subscribe_topic(topic)
 
         self._linkkit_client.publish_topic(
             f"/sys/{self._product_key}/{self._device_name}/app/up/account/bind",
-            json.dumps(
-                {
-                    "id": "msgid1",
-                    "version": "1.0",
-                    "request": {"clientId": self._mqtt_username},
-                    "params": {"iotToken": self._iot_token},
-                }
-            ),
+            bind_message(self._mqtt_username, self._iot_token),
         )
 
         if self.on_ready:
@@ -150,8 +162,13 @@ class MammotionMQTT:
             payload,
             qos,
         )
-        payload = json.loads(payload)
-        iot_id = payload.get("params", {}).get("iotId", "")
+        try:
+            payload = orjson.loads(payload)
+        except orjson.JSONDecodeError as ex:
+            logger.error("Invalid payload on topic %s: %s", topic, ex)
+            return
+        params = payload.get("params") if isinstance(payload, dict) else None
+        iot_id = params.get("iotId", "") if isinstance(params, dict) else ""
         if iot_id != "" and self.on_message:
             future = asyncio.run_coroutine_threadsafe(self.on_message(topic, payload, iot_id), self.loop)
             asyncio.wrap_future(future, loop=self.loop)
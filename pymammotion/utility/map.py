@@ -1,3 +1,4 @@
+from functools import lru_cache
 import math
 
 import numpy as np
@@ -70,3 +71,36 @@ class CoordinateConverter:
         )
 
         return Point(latitude=lat, longitude=lon)
+
+    def enu_to_lla_array(self, e: np.ndarray, n: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Convert arrays of points in one pass, same argument order as enu_to_lla.
+
+        Returns (latitude, longitude) arrays in degrees.
+        """
+        e = np.asarray(e, dtype=np.float64)
+        n = np.asarray(n, dtype=np.float64)
+        d3 = self.R_[0][0] * n + self.R_[1][0] * e + self.x0_
+        d4 = self.R_[0][1] * n + self.R_[1][1] * e + self.y0_
+        d5 = self.R_[0][2] * n + self.R_[1][2] * e + self.z0_
+
+        hypot = np.hypot(d3, d4)
+        atan2_lat = np.arctan2(self.WGS84A * d5, self.b_ * hypot)
+
+        sin_lat = np.sin(atan2_lat)
+        cos_lat = np.cos(atan2_lat)
+
+        lon = np.degrees(np.arctan2(d4, d3))
+        lat = np.degrees(
+            np.arctan2(d5 + self.ep2_ * self.b_ * (sin_lat**3), hypot - self.e2_ * self.WGS84A * (cos_lat**3))
+        )
+        return lat, lon
+
+
+@lru_cache(maxsize=64)
+def get_coordinate_converter(latitude_rad: float, longitude_rad: float) -> CoordinateConverter:
+    """Return a shared converter for an RTK base position.
+
+    The converter is read only once built, so every message and every map export
+    for the same base reuses it instead of recomputing the rotation matrix.
+    """
+    return CoordinateConverter(latitude_rad, longitude_rad)
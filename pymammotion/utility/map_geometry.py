@@ -0,0 +1,140 @@
+"""Assemble HashList frames into map geometry and export it as GeoJSON or WKB."""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+import struct
+from typing import Any
+
+import numpy as np
+
+from pymammotion.data.model.hash_list import FrameList, HashList, NavGetCommData, PathType
+from pymammotion.data.model.location import Point
+from pymammotion.utility.map import get_coordinate_converter
+
+# WKB geometry type ids
+WKB_LINESTRING = 2
+WKB_POLYGON = 3
+
+# areas, obstacles and dump zones are closed boundaries, paths are lines
+POLYGON_TYPES = frozenset({PathType.AREA, PathType.OBSTACLE, PathType.DUMP})
+LINE_TYPES = frozenset({PathType.PATH})
+
+
+def frame_coordinates(frames: FrameList) -> tuple[np.ndarray, np.ndarray]:
+    """Return the x and y of every point of a hash, frames stitched in frame order."""
+    ordered = sorted(
+        (frame for frame in frames.data if isinstance(frame, NavGetCommData)), key=lambda frame: frame.current_frame
+    )
+    if not ordered:
+        return np.empty(0), np.empty(0)
+    points = np.concatenate([np.frombuffer(frame.data_couple.data, dtype=np.float64) for frame in ordered])
+    return points[0::2], points[1::2]
+
+
+@dataclass(frozen=True, eq=False)
+class HashGeometry:
+    """Geometry of one map hash in WGS84 degrees."""
+
+    hash: int
+    type: PathType
+    latitude: np.ndarray
+    longitude: np.ndarray
+
+    @property
+    def is_polygon(self) -> bool:
+        return self.type in POLYGON_TYPES
+
+    @cached_property
+    def _ring(self) -> np.ndarray:
+        """(lon, lat) pairs, closed for polygons."""
+        coordinates = np.column_stack((self.longitude, self.latitude))
+        if self.is_polygon and len(coordinates) > 0 and not np.array_equal(coordinates[0], coordinates[-1]):
+            coordinates = np.vstack((coordinates, coordinates[:1]))
+        return coordinates
+
+    @cached_property
+    def geojson(self) -> dict[str, Any]:
+        """Return a GeoJSON geometry object."""
+        coordinates = self._ring.tolist()
+        if self.is_polygon:
+            return {"type": "Polygon", "coordinates": [coordinates]}
+        return {"type": "LineString", "coordinates": coordinates}
+
+    @cached_property
+    def wkb(self) -> bytes:
+        """Return little endian WKB."""
+        points = self._ring.astype("<f8").tobytes()
+        if self.is_polygon:
+            return struct.pack("<BIII", 1, WKB_POLYGON, 1, len(self._ring)) + points
+        return struct.pack("<BII", 1, WKB_LINESTRING, len(self._ring)) + points
+
+
+class MapGeometry:
+    """Memoised geometry for the hashes of a HashList.
+
+    Entries are keyed by hash and FrameList version, so a hash is only rebuilt
+    when its frames change or the RTK base moves.
+    """
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self._max_entries = max_entries
+        self._cache: OrderedDict[int, tuple[int, float, float, HashGeometry]] = OrderedDict()
+
+    def hash_geometry(self, hash_list: HashList, hash_id: int, rtk: Point) -> HashGeometry | None:
+        """Return the geometry of a complete area, obstacle, dump or path hash."""
+        path_type = hash_list.hash_type(hash_id)
+        frames = hash_list.frame_list(hash_id)
+        if frames is None or path_type not in POLYGON_TYPES | LINE_TYPES or not frames.complete:
+            return None
+
+        cached = self._cache.get(hash_id)
+        if cached is not None and cached[:3] == (frames.version, rtk.latitude, rtk.longitude):
+            self._cache.move_to_end(hash_id)
+            return cached[3]
+
+        x, y = frame_coordinates(frames)
+        # same (pos_y, pos_x) order the device position is converted with
+        latitude, longitude = get_coordinate_converter(rtk.latitude, rtk.longitude).enu_to_lla_array(y, x)
+        geometry = HashGeometry(hash=hash_id, type=path_type, latitude=latitude, longitude=longitude)
+
+        self._cache[hash_id] = (frames.version, rtk.latitude, rtk.longitude, geometry)
+        self._cache.move_to_end(hash_id)
+        while len(self._cache) > self._max_entries:
+            self._cache.popitem(last=False)
+        return geometry
+
+    def geometries(self, hash_list: HashList, rtk: Point) -> list[HashGeometry]:
+        """Return the geometry of every complete hash in the map."""
+        return [
+            geometry
+            for hash_id in hash_list.hash_ids
+            if (geometry := self.hash_geometry(hash_list, hash_id, rtk)) is not None
+        ]
+
+    def to_geojson(self, hash_list: HashList, rtk: Point) -> dict[str, Any]:
+        """Return the whole map as a GeoJSON FeatureCollection."""
+        names = {area.hash: area.name for area in hash_list.area_name}
+        return {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": geometry.geojson,
+                    "properties": {
+                        "hash": geometry.hash,
+                        "type": geometry.type.name.lower(),
+                        "name": names.get(geometry.hash, ""),
+                    },
+                }
+                for geometry in self.geometries(hash_list, rtk)
+            ],
+        }
+
+    def to_wkb(self, hash_list: HashList, rtk: Point) -> dict[int, bytes]:
+        """Return WKB for every complete hash in the map keyed by hash."""
+        return {geometry.hash: geometry.wkb for geometry in self.geometries(hash_list, rtk)}
+
+
+# shared by every device, FrameList versions are unique so devices never see each other's entries
+map_geometry = MapGeometry()
@@ -0,0 +1,234 @@
+"""Grid index over the area and obstacle boundaries of a map for geofence queries."""
+
+from dataclasses import dataclass
+import math
+
+import numpy as np
+
+from pymammotion.data.model.hash_list import HashList, PathType
+from pymammotion.utility.map_geometry import frame_coordinates
+
+ZONE_TYPES = (PathType.AREA, PathType.OBSTACLE)
+
+
+@dataclass(frozen=True)
+class MapPosition:
+    """Where a point is relative to the map, hashes are 0 when there is none."""
+
+    area: int = 0
+    obstacle: int = 0
+    nearest_boundary: int = 0
+    distance: float = math.inf
+
+
+@dataclass(frozen=True)
+class _Polygon:
+    hash: int
+    type: PathType
+    bounds: tuple[float, float, float, float]  # min x, min y, max x, max y
+    segments: slice
+
+
+class MapSpatialIndex:
+    """Point-in-zone and nearest-boundary queries in the map's local ENU frame (metres).
+
+    Boundaries are split into segments that are bucketed into a uniform grid.
+    The index is built on the first query and rebuilt whenever the HashList
+    is replaced or any area or obstacle hash gains frames, so it can be
+    queried on every position update.
+    """
+
+    # upper bound on grid cells per side, keeps the grid small for large gardens
+    max_cells = 256
+
+    def __init__(self, cell_size: float | None = None) -> None:
+        self._cell_size = cell_size
+        self._hash_list: HashList | None = None
+        self._versions: dict[int, int] = {}
+        self._polygons: list[_Polygon] = []
+        self._segments = np.empty((0, 4))
+        self._owner = np.empty(0, dtype=np.intp)
+        # grid in CSR layout, segments of cell c are _cell_segments[_cell_starts[c]:_cell_starts[c + 1]]
+        self._cell_starts = np.zeros(1, dtype=np.intp)
+        self._cell_segments = np.empty(0, dtype=np.intp)
+        self._origin = (0.0, 0.0)
+        self._cell = 1.0
+        self._shape = (0, 0)
+
+    def _zone_versions(self, hash_list: HashList) -> dict[int, int]:
+        versions = {}
+        for hash_id in hash_list.hash_ids:
+            frames = hash_list.frame_list(hash_id)
+            if hash_list.hash_type(hash_id) in ZONE_TYPES and frames.complete:
+                versions[hash_id] = frames.version
+        return versions
+
+    def update(self, hash_list: HashList) -> None:
+        """Rebuild the index if the map has changed since it was built."""
+        versions = self._zone_versions(hash_list)
+        if hash_list is self._hash_list and versions == self._versions:
+            return
+        self._hash_list = hash_list
+        self._versions = versions
+        self._build(hash_list)
+
+    def _build(self, hash_list: HashList) -> None:
+        polygons: list[_Polygon] = []
+        segments: list[np.ndarray] = []
+        count = 0
+        for hash_id in self._versions:
+            x, y = frame_coordinates(hash_list.frame_list(hash_id))
+            if len(x) < 3:
+                continue
+            # closing edge back to the first point
+            edges = np.column_stack((x, y, np.roll(x, -1), np.roll(y, -1)))
+            polygons.append(
+                _Polygon(
+                    hash=hash_id,
+                    type=hash_list.hash_type(hash_id),
+                    bounds=(x.min(), y.min(), x.max(), y.max()),
+                    segments=slice(count, count + len(edges)),
+                )
+            )
+            segments.append(edges)
+            count += len(edges)
+
+        self._polygons = polygons
+        self._segments = np.concatenate(segments) if segments else np.empty((0, 4))
+        self._owner = np.repeat(
+            np.arange(len(polygons), dtype=np.intp), [p.segments.stop - p.segments.start for p in polygons]
+        )
+        if count == 0:
+            self._cell_starts = np.zeros(1, dtype=np.intp)
+            self._cell_segments = np.empty(0, dtype=np.intp)
+            self._shape = (0, 0)
+            return
+
+        seg = self._segments
+        min_x, min_y = np.minimum(seg[:, 0], seg[:, 2]), np.minimum(seg[:, 1], seg[:, 3])
+        max_x, max_y = np.maximum(seg[:, 0], seg[:, 2]), np.maximum(seg[:, 1], seg[:, 3])
+        origin_x, origin_y = float(min_x.min()), float(min_y.min())
+        width, height = float(max_x.max()) - origin_x, float(max_y.max()) - origin_y
+        if self._cell_size is not None:
+            cell = self._cell_size
+        else:
+            # a handful of segments per occupied cell, but no finer than a metre
+            lengths = np.hypot(seg[:, 2] - seg[:, 0], seg[:, 3] - seg[:, 1])
+            cell = max(float(np.median(lengths)) * 4, 1.0)
+        cell = max(cell, width / self.max_cells, height / self.max_cells)
+        nx, ny = int(width // cell) + 1, int(height // cell) + 1
+
+        # every cell each segment's bounding box touches
+        i0 = ((min_x - origin_x) // cell).astype(np.intp)
+        j0 = ((min_y - origin_y) // cell).astype(np.intp)
+        span_i = ((max_x - origin_x) // cell).astype(np.intp) - i0 + 1
+        span_j = ((max_y - origin_y) // cell).astype(np.intp) - j0 + 1
+        cells_per_segment = span_i * span_j
+        owner = np.repeat(np.arange(count, dtype=np.intp), cells_per_segment)
+        offset = np.arange(len(owner)) - np.repeat(np.cumsum(cells_per_segment) - cells_per_segment, cells_per_segment)
+        span = np.repeat(span_i, cells_per_segment)
+        cell_i = np.repeat(i0, cells_per_segment) + offset % span
+        cell_j = np.repeat(j0, cells_per_segment) + offset // span
+        cell_ids = cell_j * nx + cell_i
+
+        order = np.argsort(cell_ids, kind="stable")
+        self._cell_segments = owner[order]
+        self._cell_starts = np.searchsorted(cell_ids[order], np.arange(nx * ny + 1))
+        self._origin = (origin_x, origin_y)
+        self._cell = cell
+        self._shape = (nx, ny)
+
+    def _contains(self, polygon: _Polygon, x: float, y: float) -> bool:
+        min_x, min_y, max_x, max_y = polygon.bounds
+        if not (min_x <= x <= max_x and min_y <= y <= max_y):
+            return False
+        seg = self._segments[polygon.segments]
+        ay, by = seg[:, 1], seg[:, 3]
+        # even-odd rule, count the edges a ray to +x crosses
+        crosses = (ay > y) != (by > y)
+        if not crosses.any():
+            return False
+        seg = seg[crosses]
+        x_at_y = seg[:, 0] + (y - seg[:, 1]) * (seg[:, 2] - seg[:, 0]) / (seg[:, 3] - seg[:, 1])
+        return bool(np.count_nonzero(x < x_at_y) & 1)
+
+    def _box(self, ci: int, cj: int, r: int) -> np.ndarray:
+        """Return the segments in the cells within r cells of (ci, cj), duplicates included."""
+        nx, ny = self._shape
+        i0, i1 = max(ci - r, 0), min(ci + r, nx - 1)
+        j0, j1 = max(cj - r, 0), min(cj + r, ny - 1)
+        if i0 > i1 or j0 > j1:
+            return self._cell_segments[:0]
+        starts = self._cell_starts
+        # cells of a grid row are contiguous, so each row is one slice
+        return np.concatenate(
+            [self._cell_segments[starts[j * nx + i0] : starts[j * nx + i1 + 1]] for j in range(j0, j1 + 1)]
+        )
+
+    @staticmethod
+    def _closest(seg: np.ndarray, x: float, y: float) -> tuple[int, float]:
+        """Return the index in ``seg`` of the segment closest to the point and its distance."""
+        dx, dy = seg[:, 2] - seg[:, 0], seg[:, 3] - seg[:, 1]
+        length_sq = dx * dx + dy * dy
+        along = (x - seg[:, 0]) * dx + (y - seg[:, 1]) * dy
+        t = np.divide(along, length_sq, out=np.zeros_like(dx), where=length_sq > 0)
+        np.clip(t, 0.0, 1.0, out=t)
+        distances = np.hypot(seg[:, 0] + t * dx - x, seg[:, 1] + t * dy - y)
+        nearest = int(distances.argmin())
+        return nearest, float(distances[nearest])
+
+    def _nearest(self, x: float, y: float) -> tuple[int, float]:
+        if not self._polygons:
+            return 0, math.inf
+        nx, ny = self._shape
+        ci = math.floor((x - self._origin[0]) / self._cell)
+        cj = math.floor((y - self._origin[1]) / self._cell)
+        # smallest box that reaches the grid at all
+        r = max(-ci, ci - nx + 1, -cj, cj - ny + 1, 0)
+        while True:
+            indices = self._box(ci, cj, r)
+            if len(indices) == 0:
+                r = max(2 * r, 1)
+                continue
+            nearest, distance = self._closest(self._segments[indices], x, y)
+            # anything outside the box is at least r cells away
+            if distance <= r * self._cell:
+                return self._polygons[self._owner[indices[nearest]]].hash, distance
+            # the box that certainly holds the closest segment
+            r = math.ceil(distance / self._cell)
+
+    def area_at(self, hash_list: HashList, x: float, y: float) -> int:
+        """Return the hash of the area containing the point or 0."""
+        self.update(hash_list)
+        return next(
+            (p.hash for p in self._polygons if p.type == PathType.AREA and self._contains(p, x, y)),
+            0,
+        )
+
+    def obstacle_at(self, hash_list: HashList, x: float, y: float) -> int:
+        """Return the hash of the obstacle containing the point or 0."""
+        self.update(hash_list)
+        return next(
+            (p.hash for p in self._polygons if p.type == PathType.OBSTACLE and self._contains(p, x, y)),
+            0,
+        )
+
+    def nearest_boundary(self, hash_list: HashList, x: float, y: float) -> tuple[int, float]:
+        """Return (hash, distance in metres) of the closest area or obstacle edge."""
+        self.update(hash_list)
+        return self._nearest(x, y)
+
+    def locate(self, hash_list: HashList, x: float, y: float) -> MapPosition:
+        """Answer all queries for a point at once."""
+        self.update(hash_list)
+        nearest_boundary, distance = self._nearest(x, y)
+        area = obstacle = 0
+        for polygon in self._polygons:
+            if (polygon.type == PathType.AREA and area) or (polygon.type == PathType.OBSTACLE and obstacle):
+                continue
+            if self._contains(polygon, x, y):
+                if polygon.type == PathType.AREA:
+                    area = polygon.hash
+                else:
+                    obstacle = polygon.hash
+        return MapPosition(area=area, obstacle=obstacle, nearest_boundary=nearest_boundary, distance=distance)
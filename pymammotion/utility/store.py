@@ -0,0 +1,78 @@
+"""Pluggable persistence for cached sessions and device data."""
+
+import asyncio
+import hashlib
+import logging
+import os
+from pathlib import Path
+import tempfile
+from typing import Any, Protocol
+
+import orjson
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Store(Protocol):
+    """Key value storage for JSON serialisable dicts.
+
+    Implement this to keep cached data somewhere other than the local disk,
+    e.g. the storage helpers of a home automation platform.
+    """
+
+    async def load(self, key: str) -> dict[str, Any] | None:
+        """Return the data saved under ``key`` or None."""
+
+    async def save(self, key: str, data: dict[str, Any]) -> None:
+        """Save ``data`` under ``key``."""
+
+    async def remove(self, key: str) -> None:
+        """Forget the data saved under ``key``."""
+
+
+class JsonFileStore:
+    """Store each key as a JSON file in a directory, file IO runs in the default executor.
+
+    Cached sessions hold tokens and device secrets, so the directory is created
+    readable by the owner only and every file is written with mode 0600.
+    """
+
+    def __init__(self, path: str | os.PathLike) -> None:
+        self.path = Path(path)
+
+    def _file(self, key: str) -> Path:
+        # keys are account names or device ids, hash them to get a safe file name
+        return self.path / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+    def _load(self, key: str) -> dict[str, Any] | None:
+        try:
+            return orjson.loads(self._file(key).read_bytes())
+        except FileNotFoundError:
+            return None
+        except orjson.JSONDecodeError:
+            _LOGGER.warning("Discarding corrupt cache file for %s", key)
+            return None
+
+    def _save(self, key: str, data: dict[str, Any]) -> None:
+        self.path.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # a temp file of its own per save, a token refresh and a login may save the same key at once
+        with tempfile.NamedTemporaryFile(dir=self.path, suffix=".tmp", delete=False) as tmp_file:
+            tmp_file.write(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+        try:
+            # replace atomically so a crash never leaves a half written cache behind
+            os.replace(tmp_file.name, self._file(key))
+        except OSError:
+            os.unlink(tmp_file.name)
+            raise
+
+    def _remove(self, key: str) -> None:
+        self._file(key).unlink(missing_ok=True)
+
+    async def load(self, key: str) -> dict[str, Any] | None:
+        return await asyncio.get_running_loop().run_in_executor(None, self._load, key)
+
+    async def save(self, key: str, data: dict[str, Any]) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self._save, key, data)
+
+    async def remove(self, key: str) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self._remove, key)
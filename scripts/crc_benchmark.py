@@ -0,0 +1,32 @@
+"""Compare the Blufi CRC16 implementations at BLE frame sizes.
+
+Run from the repository root: python scripts/crc_benchmark.py
+"""
+
+import os
+import timeit
+
+from pymammotion.bluetooth.crc import CRC_TB, _crc_hqx_py, calc_crc
+
+
+def calc_crc_loop(initial: int, data: bytes) -> int:
+    """The per byte loop BleMessage.calc_crc used before."""
+    crc = ~initial & 0xFFFF
+    for byte in data:
+        crc = ((crc << 8) ^ CRC_TB[byte ^ (crc >> 8)]) & 0xFFFF
+    return ~crc & 0xFFFF
+
+
+def main() -> None:
+    print(f"{'bytes':>6} {'python loop (us)':>18} {'crc_hqx (us)':>14} {'speedup':>8}")
+    for size in (20, 64, 128, 244, 512, 517):
+        data = os.urandom(size)
+        assert calc_crc(0, data) == calc_crc_loop(0, data) == ~_crc_hqx_py(data, 0xFFFF) & 0xFFFF
+        number = 20000
+        loop = timeit.timeit(lambda: calc_crc_loop(0, data), number=number) / number * 1e6
+        native = timeit.timeit(lambda: calc_crc(0, data), number=number) / number * 1e6
+        print(f"{size:>6} {loop:>18.2f} {native:>14.2f} {loop / native:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()